@@ -1,32 +1,200 @@
 from collections import Counter, defaultdict
 from functools import lru_cache
 import string
+import time
 
-from wordle_rs import get_remaining as get_remaining_rs
+import numpy as np
 
-from words import valid, answers, likely, unlikely
+from budget import SAMPLE_SIZE, ScoringBudget, estimate_seconds, scan_scores
+from cache import BoundedCache, set_fingerprint
+from game_state import GameState
+from hard_mode import HardModeIndex, hard_mode_rules
+from multiboard import MultiBoardScorer
+from opening_book import BOOK_PATH, GuessRange, OpeningBook, write_book
+from score_cache import ScoreCache
+from wordlists import valid, answers, likely, unlikely
+import patterns
 
 
 # Consider using any word in the dictionary (ie~ "easy mode") when this many words are remaining in
 # the valid set (or fewer). Otherwise, use hard mode.
 CONSIDER_ALL_WORDS_MAXIMUM = 160
 
-SCORE_UP_TO_SIZE = 530
 LIST_WORDS_UP_TO = 190
 
 STARTING_WORD = 'rales'
 
+# Limits on the cache of remaining words, used by the filter-based backends
+REMAINING_CACHE_MAX_BYTES = 256 * 1024 * 1024
+REMAINING_CACHE_MAX_ENTRIES = None
+
+# Set by set_workers(), to score guesses on a process pool
+PARALLEL_SCORER = None
+
+# Set by set_lookahead(), to pick and judge guesses by searching several guesses ahead
+LOOKAHEAD_SOLVER = None
+
+# Searching ahead from more words than this takes too long for post-game analysis
+LOOKAHEAD_ANALYSIS_MAXIMUM = 1000
+
+# With fewer answers than this, it's faster to score every guess than to prune
+PRUNE_FROM_SIZE = 2000
+
+# How many best/worst guess calculations to keep around, keyed by the remaining words
+GUESS_RANGE_CACHE_MAX_ENTRIES = 10_000
+
+# How many words to keep the letter counts of. Enough for the whole dictionary, while still keeping
+# made-up words (which only the filter-based backends see) from growing it forever.
+LETTER_COUNTS_CACHE_MAX_ENTRIES = 20_000
+
+# Set by set_score_cache(), to save guess scores on disk and share them between runs
+SCORE_CACHE = None
+
+# Scoring fewer (guess, answer) pairs than this is quicker than looking them up on disk
+SCORE_CACHE_MINIMUM_PAIRS = 250_000
+
+# Set by set_profiler(), to count calls and time rounds on the hot paths
+PROFILER = None
+
 
 def select_best_guess(possible_answers, possible_guesses):
-    averages = guess_averages(possible_answers, possible_guesses)
-    # score is the first element of the guess tuple, so we can just naively sort the results
-    return min(averages)
+    possible_guesses = list(possible_guesses)
+    if should_prune(possible_answers, possible_guesses):
+        matrix = patterns.default_matrix()
+        answer_indices = matrix.answers.indices(as_candidates(possible_answers))
+        promising_guesses = letter_frequency_order(possible_answers, possible_guesses)
+        return matrix.extreme_guess(promising_guesses, answer_indices)
+    elif can_use_patterns(possible_answers, possible_guesses):
+        averages = guess_scores(possible_answers, possible_guesses).expected_remaining
+        best_score = averages.min()
+        # break ties the same way as sorting the (score, guess) tuples would
+        best_guess = min(possible_guesses[idx] for idx in np.flatnonzero(averages == best_score))
+        return (best_score.item(), best_guess)
+    else:
+        averages = guess_averages(possible_answers, possible_guesses)
+        # score is the first element of the guess tuple, so we can just naively sort the results
+        return min(averages)
+
+def select_worst_guess(possible_answers, possible_guesses):
+    possible_guesses = list(possible_guesses)
+    if should_prune(possible_answers, possible_guesses):
+        matrix = patterns.default_matrix()
+        answer_indices = matrix.answers.indices(as_candidates(possible_answers))
+        unpromising_guesses = letter_frequency_order(possible_answers, possible_guesses)[::-1]
+        return matrix.extreme_guess(unpromising_guesses, answer_indices, worst=True)
+    else:
+        return max(guess_averages(possible_answers, possible_guesses))
+
+def should_prune(possible_answers, possible_guesses):
+    # Branch-and-bound only pays off on big answer sets. Also, the process pool scores everything
+    # in parallel anyway, and the score cache needs every guess scored (after which it's a lookup).
+    return (
+        PARALLEL_SCORER is None
+        and SCORE_CACHE is None
+        and len(possible_answers) >= PRUNE_FROM_SIZE
+        and can_use_patterns(possible_answers, possible_guesses)
+    )
+
+def letter_frequency_order(possible_answers, possible_guesses):
+    # Sort guesses so that the ones using the most common letters of the possible answers (in the
+    # most common positions) come first. Those tend to split the answers up the most.
+    positional_counts = top_positional_letters(possible_answers)
+    letter_counts = Counter(letter for word in possible_answers for letter in set(word))
+
+    def letter_score(guess):
+        return (
+            sum(letter_counts[letter] for letter in set(guess))
+            + sum(positional_counts[idx][letter] for idx, letter in enumerate(guess))
+        )
+
+    return sorted(possible_guesses, key=letter_score, reverse=True)
+
+def guess_scores(possible_answers, possible_guesses):
+    # Score all guesses in one numpy batch. Only works when can_use_patterns() is True.
+    matrix = patterns.default_matrix()
+    answer_indices = matrix.answers.indices(as_candidates(possible_answers))
+
+    def calculate(guesses):
+        if PARALLEL_SCORER is not None:
+            return PARALLEL_SCORER.score(guesses, answer_indices)
+        else:
+            return matrix.score(guesses, answer_indices)
+
+    possible_guesses = list(possible_guesses)
+    num_pairs = len(possible_guesses) * len(answer_indices)
+    if SCORE_CACHE is None or num_pairs < SCORE_CACHE_MINIMUM_PAIRS:
+        return calculate(possible_guesses)
+    else:
+        return SCORE_CACHE.scores(word_list_version(), answer_indices, possible_guesses, calculate)
+
+@lru_cache(maxsize=1)
+def word_list_version():
+    return patterns.default_matrix().fingerprint()
+
+def set_score_cache(path):
+    global SCORE_CACHE
+    SCORE_CACHE = None if path is None else ScoreCache(path)
+
+def set_workers(workers):
+    global PARALLEL_SCORER
+    if PARALLEL_SCORER is not None:
+        PARALLEL_SCORER.close()
+        PARALLEL_SCORER = None
+
+    if workers > 1:
+        from parallel import ParallelScorer, usable_workers
+        workers = usable_workers(workers)
+        if workers > 1:
+            PARALLEL_SCORER = ParallelScorer(patterns.default_matrix(), workers)
+
+def set_profiler(sample_interval=None):
+    global PROFILER
+    from profiling import Profiler
+    PROFILER = Profiler(sample_interval)
+    return PROFILER
+
+def cache_stats():
+    # Hits and misses of every cache on the hot paths, for the profile summary
+    stats = {
+        'remaining': REMAINING_CACHE.stats(),
+        'guess_range': GUESS_RANGE_CACHE.stats(),
+        'compile_filters': compile_filters.cache_info()._asdict(),
+        'letter_counts': letter_counts.cache_info()._asdict(),
+    }
+    if SCORE_CACHE is not None:
+        stats['score'] = SCORE_CACHE.stats()
+    if LOOKAHEAD_SOLVER is not None:
+        stats['lookahead'] = LOOKAHEAD_SOLVER.table.stats()
+    return stats
+
+def set_lookahead(depth):
+    global LOOKAHEAD_SOLVER
+    if depth is not None and depth < 0:
+        raise ValueError(f"Lookahead depth must be 0 or more, got {depth}")
+    elif depth:
+        from lookahead import LookaheadSolver
+        LOOKAHEAD_SOLVER = LookaheadSolver(
+            patterns.default_matrix(),
+            likely,
+            CONSIDER_ALL_WORDS_MAXIMUM,
+            depth,
+        )
+    else:
+        LOOKAHEAD_SOLVER = None
 
 def guess_averages(possible_answers, possible_guesses):
-    frozen_answers = frozenset(possible_answers)
-    return [(average_remaining(frozen_answers, guess), guess) for guess in possible_guesses]
+    possible_guesses = list(possible_guesses)
+    if can_use_patterns(possible_answers, possible_guesses):
+        averages = guess_scores(possible_answers, possible_guesses).expected_remaining
+        return list(zip(averages.tolist(), possible_guesses))
+    else:
+        frozen_answers = frozenset(possible_answers)
+        return [(average_remaining(frozen_answers, guess), guess) for guess in possible_guesses]
 
 def average_remaining(possible_answers, guess):
+    if can_use_patterns(possible_answers, [guess]):
+        return guess_scores(possible_answers, [guess]).expected_remaining[0].item()
+
     frozen_answers = frozenset(possible_answers)
     remaining = [calculate_remaining(frozen_answers, answer, guess) for answer in possible_answers]
     if remaining:
@@ -86,34 +254,177 @@ def make_filters(actual_answer, guess):
 
     return tuple(filters)
 
-@lru_cache(maxsize=2500)
 def apply_filters(candidate_answers, filters):
     joined_filter = filter_intersection(filters)
     return set(filter(joined_filter, candidate_answers))
 
-CACHED = {}
+ALL_LETTERS = (1 << 26) - 1
+
+def letter_bit(letter):
+    return 1 << (ord(letter) - ord('a'))
+
+@lru_cache(maxsize=LETTER_COUNTS_CACHE_MAX_ENTRIES)
+def letter_counts(word):
+    return Counter(word)
+
+@lru_cache(maxsize=2500)
+def compile_filters(filters):
+    # Turn the filters from make_filters() into a mask of allowed letters for each position, and
+    # the min/max number of times each letter can show up. Then any word can be checked in a
+    # single pass, without calling a closure per filter.
+    position_masks = {}
+    min_counts = {}
+    max_counts = {}
+    for f, *args in filters:
+        if f is filter_exact:
+            idx, letter = args
+            position_masks[idx] = position_masks.get(idx, ALL_LETTERS) & letter_bit(letter)
+        elif f is filter_letter_elsewhere:
+            idx, letter = args
+            position_masks[idx] = position_masks.get(idx, ALL_LETTERS) & ~letter_bit(letter)
+        elif f is filter_min_count:
+            letter, count = args
+            min_counts[letter] = max(min_counts.get(letter, 0), count)
+        elif f is filter_exact_count:
+            letter, count = args
+            min_counts[letter] = max(min_counts.get(letter, 0), count)
+            max_counts[letter] = min(max_counts.get(letter, count), count)
+        elif f is filter_eliminated:
+            letter, = args
+            max_counts[letter] = 0
+        else:
+            raise ValueError(f"Can't compile unknown filter {f!r}")
+
+    # Checking a letter against a set is cheaper than building its bit, so unpack the masks. Most
+    # words get rejected by the first check, so put the pickiest positions first.
+    allowed_letters = sorted(
+        (
+            (idx, frozenset(l for l in string.ascii_lowercase if mask & letter_bit(l)))
+            for idx, mask in position_masks.items()
+        ),
+        key=lambda position: len(position[1]),
+    )
+    count_bounds = tuple(
+        (letter, min_counts.get(letter, 0), max_counts.get(letter, float('inf')))
+        for letter in set(min_counts) | set(max_counts)
+    )
+    return tuple(allowed_letters), count_bounds
+
+def apply_compiled_filters(candidate_answers, filters):
+    allowed_letters, count_bounds = compile_filters(filters)
+    remaining = set()
+    for word in candidate_answers:
+        for idx, allowed in allowed_letters:
+            if word[idx] not in allowed:
+                break
+        else:
+            counts = letter_counts(word)
+            for letter, min_count, max_count in count_bounds:
+                if not min_count <= counts[letter] <= max_count:
+                    break
+            else:
+                remaining.add(word)
+    return remaining
+
+# Shared by all the filter-based backends, since the same filters on the same candidates leave the
+# same words, no matter who calculated them.
+REMAINING_CACHE = BoundedCache(
+    max_bytes=REMAINING_CACHE_MAX_BYTES,
+    max_entries=REMAINING_CACHE_MAX_ENTRIES,
+)
+
+def cached_remaining(candidate_answers, filters, calculate):
+    key = (filters, set_fingerprint(candidate_answers))
+    remaining = REMAINING_CACHE.get(key)
+    if remaining is None:
+        remaining = frozenset(calculate())
+        REMAINING_CACHE.put(key, remaining)
+    # hand out a copy, so callers can't modify the cached value
+    return set(remaining)
 
 def get_remaining_lib(candidate_answers, actual_answer, guess):
+    if PROFILER is not None:
+        PROFILER.call('get_remaining.lib', len(candidate_answers))
+    # Only load the rust extension if it's actually needed
+    from wordle_rs import get_remaining as get_remaining_rs
+
     if guess == actual_answer:
         return set()
     else:
         filters = make_filters(actual_answer, guess)
-        frozen_candidates = frozenset(candidate_answers)
-        if (filters, frozen_candidates) in CACHED:
-            return CACHED[(filters, frozen_candidates)]
-        else:
-            remaining = get_remaining_rs(set(candidate_answers), actual_answer, guess)
-            CACHED[(filters, frozen_candidates)] = remaining
-            return remaining
+        return cached_remaining(
+            candidate_answers,
+            filters,
+            lambda: get_remaining_rs(set(candidate_answers), actual_answer, guess),
+        )
 
 def get_remaining_py(candidate_answers, actual_answer, guess):
+    if PROFILER is not None:
+        PROFILER.call('get_remaining.py', len(candidate_answers))
+    if guess == actual_answer:
+        return set()
+    else:
+        filters = make_filters(actual_answer, guess)
+        return cached_remaining(
+            candidate_answers,
+            filters,
+            lambda: apply_filters(candidate_answers, filters),
+        )
+
+def get_remaining_compiled(candidate_answers, actual_answer, guess):
+    if PROFILER is not None:
+        PROFILER.call('get_remaining.compiled', len(candidate_answers))
     if guess == actual_answer:
         return set()
     else:
         filters = make_filters(actual_answer, guess)
-        return apply_filters(frozenset(candidate_answers), filters)
+        return cached_remaining(
+            candidate_answers,
+            filters,
+            lambda: apply_compiled_filters(candidate_answers, filters),
+        )
+
+def as_candidates(words):
+    # Convert words to a WordSet bitset over the pattern matrix's answers, if they all fit.
+    # Otherwise, leave them as a plain set of strings.
+    answer_index = patterns.default_matrix().answers
+    if answer_index.covers(words):
+        return answer_index.word_set(words)
+    else:
+        return frozenset(words)
 
-get_remaining = get_remaining_lib
+def can_use_patterns(candidate_answers, guesses):
+    # The pattern matrix only knows about answers in the dictionary. Anything else (like the
+    # made-up words in the tests) falls back to filtering.
+    return (
+        all(len(guess) == patterns.WORD_LENGTH for guess in guesses)
+        and patterns.default_matrix().answers.covers(candidate_answers)
+    )
+
+def get_remaining_patterns(candidate_answers, actual_answer, guess):
+    if guess == actual_answer:
+        return set()
+    elif can_use_patterns(candidate_answers, [guess, actual_answer]):
+        if PROFILER is not None:
+            PROFILER.call('get_remaining.patterns', len(candidate_answers))
+        # Keep the candidates that would have shown the same colors as the actual answer did
+        matrix = patterns.default_matrix()
+        target = patterns.feedback_pattern(guess, actual_answer)
+        return matrix.matching(guess, target) & as_candidates(candidate_answers)
+    else:
+        return fallback_get_remaining()(candidate_answers, actual_answer, guess)
+
+@lru_cache(maxsize=1)
+def fallback_get_remaining():
+    # For anything the pattern matrix can't handle. Prefer the rust extension, if it's installed.
+    try:
+        import wordle_rs
+    except ImportError:
+        return get_remaining_compiled
+    else:
+        return get_remaining_lib
+
+get_remaining = get_remaining_patterns
 
 def calculate_remaining(possible_answers, answer, guess):
     if guess == answer:
@@ -121,12 +432,208 @@ def calculate_remaining(possible_answers, answer, guess):
     else:
         return len(get_remaining(possible_answers, answer, guess))
 
-def top_positional_letters():
+@lru_cache(maxsize=1)
+def hard_mode_index():
+    return HardModeIndex(valid)
+
+def hard_mode_guesses(previous_guesses, actual):
+    # Every guess that hard mode allows after the previous guesses: any word in the dictionary
+    # that reuses all the greens and yellows revealed so far
+    return hard_mode_index().legal_after(previous_guesses, actual)
+
+def calculate_guess_range(remaining, hard_guesses=None):
+    if len(remaining) > CONSIDER_ALL_WORDS_MAXIMUM:
+        easy_best_score, easy_best_guess = None, None
+    else:
+        easy_best_score, easy_best_guess = select_best_guess(remaining, likely)
+
+    if hard_guesses is None:
+        hard_best_score, hard_best_guess = None, None
+    else:
+        hard_best_score, hard_best_guess = select_best_guess(remaining, hard_guesses)
+
+    best_score, best_guess = select_best_guess(remaining, remaining)
+    worst_score, worst_guess = select_worst_guess(remaining, remaining)
+    return GuessRange(
+        best_score,
+        best_guess,
+        worst_score,
+        worst_guess,
+        easy_best_score,
+        easy_best_guess,
+        hard_best_score,
+        hard_best_guess,
+    )
+
+GUESS_RANGE_CACHE = BoundedCache(max_entries=GUESS_RANGE_CACHE_MAX_ENTRIES)
+
+def guess_range_key(remaining, hard_guesses):
+    return (set_fingerprint(remaining), hard_guesses)
+
+def guess_range_for(previous_guesses, actual, remaining):
+    guess_range = book_guess_range(previous_guesses, actual)
+    if guess_range is not None:
+        return guess_range
+
+    # Lots of different games end up with the same remaining words, so keep the result around
+    hard_guesses = hard_mode_guesses(previous_guesses, actual)
+    key = guess_range_key(remaining, hard_guesses)
+    guess_range = GUESS_RANGE_CACHE.get(key)
+    if guess_range is None:
+        guess_range = calculate_guess_range(remaining, hard_guesses)
+        GUESS_RANGE_CACHE.put(key, guess_range)
+    return guess_range
+
+def budgeted_guess_range(previous_guesses, actual, remaining, budget):
+    # Like guess_range_for(), but approximates (or gives up) to stay within the budget. Returns
+    # (guess_range, notes), where the notes explain any shortcuts taken. guess_range is None when
+    # there wasn't time to find anything.
+    hard_guesses = hard_mode_guesses(previous_guesses, actual)
+    guess_range = book_guess_range(previous_guesses, actual)
+    if guess_range is None:
+        guess_range = GUESS_RANGE_CACHE.get(guess_range_key(remaining, hard_guesses))
+    if guess_range is not None or not can_use_patterns(remaining, likely):
+        # already known, or can't be estimated anyway
+        return guess_range_for(previous_guesses, actual, remaining), []
+
+    matrix = patterns.default_matrix()
+    answer_indices = matrix.answers.indices(as_candidates(remaining))
+    num_answers = len(answer_indices)
+    consider_all_words = num_answers <= CONSIDER_ALL_WORDS_MAXIMUM
+    # the remaining words are always among the hard-mode guesses, and the likely words
+    all_guesses = (likely | set(hard_guesses)) if consider_all_words else hard_guesses
+    guesses = letter_frequency_order(remaining, all_guesses)
+    guess_indices = matrix.guess_indices(guesses)
+
+    seconds_left = budget.seconds_left()
+    exact_seconds = estimate_seconds(matrix, guess_indices, num_answers)
+    if exact_seconds <= seconds_left:
+        sample_size = None
+    elif estimate_seconds(matrix, guess_indices, SAMPLE_SIZE) <= seconds_left:
+        sample_size = SAMPLE_SIZE
+    else:
+        return None, [
+            f"Skipped finding the best and worst guesses: estimated {exact_seconds:.1f}s,"
+            f" with {seconds_left:.1f}s left"
+        ]
+
+    scores, intervals = scan_scores(matrix, guess_indices, answer_indices, budget, sample_size)
+    scored = ~np.isnan(scores)
+    in_remaining = np.array([guess in remaining for guess in guesses])
+    possible_answers = np.flatnonzero(scored & in_remaining).tolist()
+    if not possible_answers:
+        return None, ["Ran out of time before finding the best and worst guesses"]
+
+    def best_of(pool):
+        # break ties the same way as min() and max() on (score, guess) tuples
+        in_pool = np.array([guess in pool for guess in guesses])
+        return min((scores[idx].item(), guesses[idx]) for idx in np.flatnonzero(scored & in_pool))
+
+    best_score, best_idx = min(
+        (scores[idx].item(), guesses[idx], idx) for idx in possible_answers
+    )[::2]
+    worst_score, worst_idx = max(
+        (scores[idx].item(), guesses[idx], idx) for idx in possible_answers
+    )[::2]
+    if consider_all_words:
+        easy_best_score, easy_best_guess = best_of(likely)
+    else:
+        easy_best_score, easy_best_guess = None, None
+    guess_range = GuessRange(
+        best_score,
+        guesses[best_idx],
+        worst_score,
+        guesses[worst_idx],
+        easy_best_score,
+        easy_best_guess,
+        *best_of(hard_guesses),
+    )
+
+    notes = []
+    num_scored = np.count_nonzero(scored)
+    if num_scored < len(guesses):
+        notes.append(
+            f"Ran out of time after scoring {num_scored} of {len(guesses)} guesses,"
+            " so best and worst are only among those"
+        )
+    if sample_size is not None:
+        notes.append(
+            f"Approximate scores, against a sample of {sample_size} of {num_answers} answers."
+            f" At 95% confidence, best is ±{intervals[best_idx]:.1f}"
+            f" and worst is ±{intervals[worst_idx]:.1f} words"
+        )
+    if not notes:
+        GUESS_RANGE_CACHE.put(guess_range_key(remaining, hard_guesses), guess_range)
+    return guess_range, notes
+
+def opening_book_key():
+    # Easy-mode guesses in the book depend on CONSIDER_ALL_WORDS_MAXIMUM, too
+    return f"{patterns.default_matrix().fingerprint()}:{CONSIDER_ALL_WORDS_MAXIMUM}"
+
+@lru_cache(maxsize=1)
+def load_opening_book():
+    book = OpeningBook(BOOK_PATH, opening_book_key())
+    if book.is_current():
+        return book
+    else:
+        return None
+
+def book_opener_score(guess):
+    book = load_opening_book()
+    if book is None:
+        return None
+    else:
+        return book.opener_score(guess)
+
+def book_guess_range(previous_guesses, actual):
+    # The opening book only covers the first guess, and the second guess after each opener
+    # in it. Returns None for anything else.
+    book = load_opening_book()
+    if book is None:
+        return None
+    elif not previous_guesses:
+        return book.opener_range()
+    elif len(previous_guesses) == 1:
+        opener = previous_guesses[0]
+        return book.follow_up(opener, patterns.feedback_pattern(opener, actual))
+    else:
+        return None
+
+def build_opening_book(openers):
+    matrix = patterns.default_matrix()
+    all_candidates = as_candidates(likely)
+    opening_guesses = sorted(valid)
+
+    print(f"Scoring {len(opening_guesses)} opening guesses...")
+    scores = guess_scores(all_candidates, opening_guesses).expected_remaining.tolist()
+    opener_scores = [
+        (guess, score, guess in all_candidates)
+        for guess, score in zip(opening_guesses, scores)
+    ]
+
+    follow_ups = []
+    for opener in openers:
+        opener_patterns = set(matrix.row(opener)[matrix.answers.indices(all_candidates)].tolist())
+        print(f"Finding the best guesses after {opener!r}, for {len(opener_patterns)} patterns...")
+        for pattern in sorted(opener_patterns):
+            remaining = matrix.matching(opener, pattern) & all_candidates
+            if len(remaining) > 1:
+                hard_guesses = hard_mode_index().legal_guesses(
+                    *hard_mode_rules([opener], [pattern])
+                )
+                guess_range = calculate_guess_range(remaining, hard_guesses)
+                follow_ups.append((opener, pattern, guess_range))
+
+    write_book(BOOK_PATH, opening_book_key(), opener_scores, follow_ups)
+    load_opening_book.cache_clear()
+    print(f"Wrote opening book to {BOOK_PATH}")
+
+def top_positional_letters(words=valid):
     # returns top_letters = [(0, 's'), (1, 'a'), (2, 'a'), (3, 'e'), (4, 's')]
-    pos_c = [Counter(),Counter(),Counter(),Counter(),Counter()]
-    for v in valid:
-        for i in range(0,5):
-            pos_c[i].update(v[i])
+    pos_c = [Counter() for _ in range(max((len(v) for v in words), default=0))]
+    for v in words:
+        for i, letter in enumerate(v):
+            pos_c[i].update(letter)
     return pos_c
 
 
@@ -156,29 +663,96 @@ def most_positional_letters():
     return set()
 
 
-def ai_play(actual):
-    guess_count = 1
-    first_guess = STARTING_WORD
-    print(f"Guess #{guess_count}: {first_guess!r}")
-    remaining = get_remaining(frozenset(likely), actual, first_guess)
+def new_game_state():
+    return GameState.start(patterns.default_matrix())
 
-    while len(remaining) > 1:
-        print(f"{len(remaining)} more words found")
+def play_guess(state, guess, actual):
+    # Like get_remaining(), but on a GameState, so it reuses the split of the answers by guess if
+    # it was already scored there
+    if PROFILER is not None:
+        PROFILER.call('game_state.play', len(state.remaining))
+    return state.play_against(guess, actual)
+
+def record_round(name, guess, round_start, num_remaining):
+    if PROFILER is not None:
+        PROFILER.record_round(name, guess, time.perf_counter() - round_start, num_remaining)
+
+def next_guess(state):
+    # The AI's (estimated remaining words, guess) from a game state with more than one answer
+    # left. Only needs the colors shown so far, not the answer.
+    remaining = state.remaining
+    # the book only knows the best guesses one step ahead
+    if len(state) == 1 and LOOKAHEAD_SOLVER is None and load_opening_book() is not None:
+        book_range = load_opening_book().follow_up(state.guesses[0], state.patterns[0])
+    else:
+        book_range = None
+
+    if LOOKAHEAD_SOLVER is not None:
+        _, guess = LOOKAHEAD_SOLVER.solve(remaining)
+        return (state.expected_remaining(guess), guess)
+    elif book_range is not None:
+        # the book only has an easy-mode guess if there are few enough words to consider it
+        if book_range.easy_best_guess is None:
+            return (book_range.best_score, book_range.best_guess)
+        else:
+            return (book_range.easy_best_score, book_range.easy_best_guess)
+    else:
         if len(remaining) > CONSIDER_ALL_WORDS_MAXIMUM:
             guess_choices = remaining
         else:
             guess_choices = likely
-        avg_remain, guess = select_best_guess(remaining, guess_choices)
-        guess_count += 1
-        print(f"Guess #{guess_count}: {guess!r}, with estimated {avg_remain:.1f} remaining")
-        frozen_remaining = frozenset(remaining)
-        remaining = get_remaining(frozen_remaining, actual, guess)
-        if 0 < len(remaining) < LIST_WORDS_UP_TO:
-            print("Specifically:", remaining)
+        return select_best_guess(remaining, guess_choices)
+
+def ai_guesses(actual):
+    # Yields (guess, estimated remaining words, remaining words after the guess) for each guess the
+    # AI makes. The estimate is None for the starting word, and for a trivial final guess.
+    round_start = time.perf_counter()
+    guess = STARTING_WORD
+    state = play_guess(new_game_state(), guess, actual)
+    remaining = state.remaining
+    record_round('ai', guess, round_start, len(remaining))
+    yield (guess, None, remaining)
+
+    while len(remaining) > 1:
+        round_start = time.perf_counter()
+        avg_remain, guess = next_guess(state)
+        state = play_guess(state, guess, actual)
+        remaining = state.remaining
+        record_round('ai', guess, round_start, len(remaining))
+        yield (guess, avg_remain, remaining)
 
     if len(remaining) == 1 and guess not in remaining:
-        guess_count += 1
-        print(f"Trivial guess #{guess_count}: {remaining.pop()}")
+        yield (next(iter(remaining)), None, set())
+
+
+def ai_play(actual):
+    for guess_count, (guess, avg_remain, remaining) in enumerate(ai_guesses(actual), start=1):
+        if guess_count == 1:
+            print(f"Guess #{guess_count}: {guess!r}")
+        elif avg_remain is None:
+            print(f"Trivial guess #{guess_count}: {guess}")
+        else:
+            print(f"Guess #{guess_count}: {guess!r}, with estimated {avg_remain:.1f} remaining")
+            if 0 < len(remaining) < LIST_WORDS_UP_TO:
+                print("Specifically:", set(remaining))
+
+        if len(remaining) > 1:
+            print(f"{len(remaining)} more words found")
+
+
+def multi_board_totals(scorer, remainings, guesses):
+    # Sum of the expected remaining words of each guess, over all the boards
+    matrix = patterns.default_matrix()
+    if (
+        all(matrix.answers.covers(r) for r in remainings if r)
+        and all(guess in matrix.guess_index for guess in guesses)
+    ):
+        return scorer.total_scores(remainings, guesses)
+    else:
+        totals = np.zeros(len(guesses))
+        for r in remainings:
+            totals += [score for score, _ in guess_averages(r, guesses)]
+        return totals
 
 
 def multi_answer_ai_play(actuals):
@@ -186,12 +760,14 @@ def multi_answer_ai_play(actuals):
     guess_count = 1
     first_guess = STARTING_WORD
     print(f"Guess #{guess_count}: {first_guess!r}")
-    remainings = [
-        get_remaining(likely, actual, first_guess)
-        for actual in actuals
-    ]
+    start = new_game_state()
+    states = [play_guess(start, first_guess, actual) for actual in actuals]
+    remainings = [state.remaining for state in states]
+    # the same scoring as single-board games, so --workers and --score-cache apply here too
+    scorer = MultiBoardScorer(patterns.default_matrix(), guess_scores)
 
     while any(remainings):
+        round_start = time.perf_counter()
         unique_remaining = set(guess for remaining in remainings for guess in remaining)
         num_remainings = [len(r) for r in remainings]
         print(f"{num_remainings!r} more words found ({len(unique_remaining)} unique)")
@@ -203,7 +779,7 @@ def multi_answer_ai_play(actuals):
                 if len(remaining) == 1:
                     guess = list(remaining)[0]
                     options = [
-                        (sum(average_remaining(r, guess) for r in remainings), guess)
+                        (multi_board_totals(scorer, remainings, [guess])[0].item(), guess)
                     ]
                     break
             else:
@@ -214,164 +790,253 @@ def multi_answer_ai_play(actuals):
             else:
                 guess_choices = likely
 
-            options = [
-                (sum(average_remaining(r, guess) for r in remainings), guess)
-                for guess in guess_choices
-            ]
+            guess_choices = list(guess_choices)
+            totals = multi_board_totals(scorer, remainings, guess_choices)
+            options = list(zip(totals.tolist(), guess_choices))
 
         avg_remain, guess = min(options)
         guess_count += 1
         print(f"Guess #{guess_count}: {guess!r}, with estimated {avg_remain:.1f} remaining")
-        remainings = [
-            get_remaining(old_remaining, actual, guess)
-            for old_remaining, actual in zip(remainings, actuals)
+        states = [
+            play_guess(state, guess, actual) if state.remaining else state
+            for state, actual in zip(states, actuals)
         ]
+        remainings = [state.remaining for state in states]
         if sum(len(r) for r in remainings) < LIST_WORDS_UP_TO:
-            print(f"Specifically: {remainings!r}")
+            print(f"Specifically: {[set(r) for r in remainings]!r}")
+        record_round('mai', guess, round_start, sum(len(r) for r in remainings))
+
+
+def skill_score(guess_score, best_score):
+    # average word count that could be improved by choosing best algo word:
+    wasted_words = guess_score - best_score
+    # scale the waste to the score to guess a waste percentage
+    waste_fraction = wasted_words / guess_score
+    # invert in order to report the "happy stat"
+    return (1 - waste_fraction) * 10
+
+
+def spectrum_percent(guess_score, best_score, worst_score):
+    # where are you on the best/worst range
+    full_spectrum = (worst_score - best_score)
+    if full_spectrum:
+        return (worst_score - guess_score) / full_spectrum * 100
+    elif guess_score <= best_score:
+        return 100
+    else:
+        return 0
 
 
-def posthoc_analysis(actual, guesses):
-    remaining = frozenset(likely)
-    yield f"Post-hoc analysis of game with answer {actual!r}, with a dictionary size {len(remaining)}"
+def luck_score(guess_score, actual_left):
+    actual_left_with_answer = (actual_left + 1)
+    score_with_answer = (guess_score + 1)
+    return score_with_answer / actual_left_with_answer
 
-    total_luck_score = 1.0
+
+def describe_guess(score, guess):
+    if guess is None:
+        return None
+    else:
+        return {'guess': guess, 'expected_remaining': score}
+
+
+def lookahead_record(remaining, guess):
+    # None if there are too many words left to search
+    if len(remaining) > LOOKAHEAD_ANALYSIS_MAXIMUM:
+        return None
+
+    guess_cost = LOOKAHEAD_SOLVER.guess_cost(remaining, guess)
+    best_cost, best_guess = LOOKAHEAD_SOLVER.solve(remaining)
+    if guess_cost < best_cost:
+        # the search only goes deep on the guesses that look best one step ahead
+        best_cost, best_guess = guess_cost, guess
+    return {
+        'depth': LOOKAHEAD_SOLVER.depth,
+        'expected_guesses': guess_cost,
+        'skill_score': skill_score(guess_cost, best_cost),
+        'best': {'guess': best_guess, 'expected_guesses': best_cost},
+    }
+
+
+def guess_records(actual, guesses, budget_seconds=None):
+    # Yields a dict for each guess, with everything post-game analysis knows about it.
+    # posthoc_analysis() prints these, and batch writes them out as JSON.
+    #
+    # With budget_seconds, finding the best and worst guesses gets approximated or skipped as
+    # needed, to finish the whole game in about that long. The notes say what was cut short.
+    budget = None if budget_seconds is None else ScoringBudget(budget_seconds)
+    state = new_game_state()
 
     for idx, guess in enumerate(guesses):
+        round_start = time.perf_counter()
+        remaining = state.remaining
+
+        guess_score = book_opener_score(guess) if idx == 0 else None
+        precalculated = guess_score is not None
+        if not precalculated:
+            guess_score = state.expected_remaining(guess)
+
+        # scoring the guess already split up the answers, so this is just a lookup
+        new_state = play_guess(state, guess, actual)
+        new_remaining = new_state.remaining
+
+        record = {
+            'guess': guess,
+            'candidates': len(remaining),
+            'expected_remaining': guess_score,
+            'precalculated': precalculated,
+            'remaining': len(new_remaining),
+            'found': guess == actual,
+            'notes': [],
+        }
+
+        if 1 < len(remaining):
+            if budget is None:
+                guess_range, notes = guess_range_for(guesses[:idx], actual, remaining), []
+            else:
+                guess_range, notes = budgeted_guess_range(guesses[:idx], actual, remaining, budget)
+            record['notes'] = notes
 
-        guess_count = idx + 1
-        yield ""
-        yield f"Guess #{guess_count}: {guess!r}"
-
-        new_remaining = get_remaining(remaining, actual, guess)
-
-        if idx == 0:
-            # roate seemed the best, when looking only at the answer list, but that seems like
-            # cheating.
-            precalculated = {
-                "rales": 119.1,
-                "tares": 123.5,
-                "reals": 134.2,
-                "tears": 141.4,
-                "raise": 145.0,
-                "slate": 152.6,
-                "stare": 159.3,
-                "stale": 164.1,
-                "arise": 164.3,
-                "least": 172.0,
-                "later": 177.2,
-                "irate": 195.2,
-                "slant": 215.2,
-                "trios": 224.2,
-                "crate": 234.2,
-                "react": 234.6,
-                "trace": 238.5,
-                "crane": 246.4,
-                "trial": 273.0,
-                "erase": 277.1,
-                "triad": 283.3,
-                "count": 574.2,
-            }
-            if guess in precalculated:
-                guess_score = precalculated[guess]
-                yield (
-                    f"At the time, the guess could be expected to leave {guess_score:.1f} words"
-                    " (using a precalculated score)"
+            if guess_range is not None:
+                if guess_range.hard_best_guess is None:
+                    hard_best_score = guess_range.best_score
+                else:
+                    hard_best_score = guess_range.hard_best_score
+
+                if guess_score > 0:
+                    record['skill_score'] = skill_score(guess_score, hard_best_score)
+                    if guess_range.easy_best_guess is not None:
+                        record['easy_skill_score'] = skill_score(
+                            guess_score,
+                            guess_range.easy_best_score,
+                        )
+                record['spectrum_percent'] = spectrum_percent(
+                    guess_score,
+                    guess_range.best_score,
+                    guess_range.worst_score,
+                )
+                record['best'] = describe_guess(guess_range.best_score, guess_range.best_guess)
+                record['worst'] = describe_guess(guess_range.worst_score, guess_range.worst_guess)
+                record['hard_best'] = describe_guess(hard_best_score, guess_range.hard_best_guess)
+                record['easy_best'] = describe_guess(
+                    guess_range.easy_best_score,
+                    guess_range.easy_best_guess,
                 )
-            else:
-                yield f"No precalculated score is available for the starting word {guess!r}. Calculating..."
-                guess_score = average_remaining(remaining, guess)
-                yield f"At the time, the guess could be expected to leave {guess_score:.1f} words"
-        elif len(remaining) < 1200:
-            guess_score = average_remaining(remaining, guess)
-            yield f"At the time, the guess could be expected to leave {guess_score:.1f} words"
-        else:
-            guess_score = None
 
-        if 1 < len(remaining) < SCORE_UP_TO_SIZE:
+            if LOOKAHEAD_SOLVER is not None and can_use_patterns(remaining, [guess]):
+                record['lookahead'] = lookahead_record(remaining, guess)
 
-            # TODO test how long it takes to run the averages, and offer to
-            #   skip, instead of hard-code 300
-            # TODO return the min/max from rust, to enable analysis of bigger data sets?
-            if len(remaining) > CONSIDER_ALL_WORDS_MAXIMUM:
-                all_algo_guesses = None
-                valid_algo_guesses = guess_averages(remaining, remaining)
-            else:
-                all_algo_guesses = guess_averages(remaining, likely)
-                easy_best_score, easy_best_guess = min(all_algo_guesses)
+        record['luck'] = luck_score(guess_score, len(new_remaining))
+        if len(new_remaining) < LIST_WORDS_UP_TO and guess != actual:
+            record['remaining_words'] = sorted(new_remaining)
 
-                valid_algo_guesses = [
-                    (score, word)
-                    for score, word in all_algo_guesses
-                    if word in remaining
-                ]
+        record_round('posthoc', guess, round_start, len(new_remaining))
+        yield record
+        state = new_state
 
-            best_score, best_guess = min(valid_algo_guesses)
-            worst_score, worst_guess = max(valid_algo_guesses)
 
-            # calculate skill score
-            if guess_score is None:
-                yield "Can't calculate skill score if there's no guess score"
-            else:
-                if guess_score == 0:
-                    yield f"Skill score: ∞/10"
-                else:
-                    # average word count that could be improved by choosing best algo word:
-                    wasted_words = guess_score - best_score
-                    # scale the waste to the score to guess a waste percentage
-                    waste_fraction = wasted_words / guess_score
-                    # invert in order to report the "happy stat"
-                    skill_score = (1 - waste_fraction) * 10
-                    yield f"Skill score: {skill_score:.1f}/10"
-
-                    if all_algo_guesses is not None:
-                        easy_wasted_words = guess_score - easy_best_score
-                        easy_waste_fraction = easy_wasted_words / guess_score
-                        easy_skill_score = (1 - easy_waste_fraction) * 10
-                        yield f"Skill score (easy mode): {easy_skill_score:.1f}/10"
-
-                # where are you on the best/worst range
-                full_spectrum = (worst_score - best_score)
-                if full_spectrum:
-                    spectrum_percent = (worst_score - guess_score) / full_spectrum * 100
-                elif guess_score <= best_score:
-                    spectrum_percent = 100
-                else:
-                    spectrum_percent = 0
-                yield f"Spectrum percent: {spectrum_percent:.1f}%"
+def game_luck(records):
+    total_luck_score = 1.0
+    for record in records:
+        total_luck_score *= record['luck']
+    return total_luck_score
 
-                if all_algo_guesses is not None:
-                    yield f"   vs best {easy_best_guess!r} (easy) at {easy_best_score:.1f} word est."
-                yield f"   vs best {best_guess!r} at {best_score:.1f} word est."
-                yield f"   vs worst {worst_guess!r} at {worst_score:.1f} word est."
 
-        if guess == actual:
-            # TODO: don't add a newline after this yielded string, somehow
-            yield f"Found the final word."
+def format_guess_record(guess_count, record):
+    guess = record['guess']
+    guess_score = record['expected_remaining']
+    yield ""
+    yield f"Guess #{guess_count}: {guess!r}"
+
+    if record['precalculated']:
+        yield (
+            f"At the time, the guess could be expected to leave {guess_score:.1f} words"
+            " (using a precalculated score)"
+        )
+    else:
+        if guess_count == 1:
+            yield (
+                f"No precalculated score is available for the starting word {guess!r}."
+                " Calculating..."
+            )
+        yield f"At the time, the guess could be expected to leave {guess_score:.1f} words"
+
+    if 1 < record['candidates']:
+        yield from record['notes']
+
+        if 'best' not in record:
+            yield "Can't calculate skill score without the best and worst guesses"
         else:
-            # TODO: don't add a newline after this yielded string, somehow
-            yield f"After elimination, {len(new_remaining)} words remain."
+            if guess_score == 0:
+                yield f"Skill score: ∞/10"
+            else:
+                yield f"Skill score: {record['skill_score']:.1f}/10"
+                if 'easy_skill_score' in record:
+                    yield f"Skill score (easy mode): {record['easy_skill_score']:.1f}/10"
+
+            yield f"Spectrum percent: {record['spectrum_percent']:.1f}%"
 
-        if guess_score is not None:
-            actual_left = len(new_remaining)
-            if actual_left == guess_score:
-                yield "Got exactly the expected luck"
+            best = record['best']
+            easy_best = record['easy_best']
+            hard_best = record['hard_best']
+            worst = record['worst']
+            if easy_best is not None:
+                yield (
+                    f"   vs best {easy_best['guess']!r} (easy)"
+                    f" at {easy_best['expected_remaining']:.1f} word est."
+                )
+            if hard_best is not None and hard_best['guess'] != best['guess']:
+                yield (
+                    f"   vs best {hard_best['guess']!r} (hard)"
+                    f" at {hard_best['expected_remaining']:.1f} word est."
+                )
+            yield f"   vs best {best['guess']!r} at {best['expected_remaining']:.1f} word est."
+            yield f"   vs worst {worst['guess']!r} at {worst['expected_remaining']:.1f} word est."
+
+        if 'lookahead' in record:
+            lookahead = record['lookahead']
+            if lookahead is None:
+                yield f"Too many words remaining to look ahead, with {record['candidates']}"
             else:
-                actual_left_with_answer = (actual_left + 1)
-                score_with_answer = (guess_score + 1)
-                luck_score = score_with_answer / actual_left_with_answer
-                total_luck_score *= luck_score
-                if actual_left_with_answer < score_with_answer:
-                    yield f"Got lucky by {luck_score:.1f}x"
-                else:
-                    yield f"Got unlucky by {1 / luck_score:.1f}x"
-        else:
-            yield ""
+                best = lookahead['best']
+                yield f"Lookahead skill score: {lookahead['skill_score']:.1f}/10"
+                yield (
+                    f"   expected {lookahead['expected_guesses']:.2f} guesses to finish,"
+                    f" vs {best['expected_guesses']:.2f} after {best['guess']!r}"
+                    f" (looking {lookahead['depth']} guesses ahead)"
+                )
+
+    if record['found']:
+        # TODO: don't add a newline after this yielded string, somehow
+        yield f"Found the final word."
+    else:
+        # TODO: don't add a newline after this yielded string, somehow
+        yield f"After elimination, {record['remaining']} words remain."
+
+    if record['remaining'] == guess_score:
+        yield "Got exactly the expected luck"
+    elif record['luck'] > 1:
+        yield f"Got lucky by {record['luck']:.1f}x"
+    else:
+        yield f"Got unlucky by {1 / record['luck']:.1f}x"
+
+    if 'remaining_words' in record:
+        yield f"Specifically: {record['remaining_words']}"
 
-        remaining = frozenset(new_remaining)
 
-        if len(remaining) < LIST_WORDS_UP_TO and guess != actual:
-            yield f"Specifically: {list(sorted(remaining))}"
+def posthoc_analysis(actual, guesses, budget_seconds=None):
+    dictionary_size = len(new_game_state().remaining)
+    yield (
+        f"Post-hoc analysis of game with answer {actual!r},"
+        f" with a dictionary size {dictionary_size}"
+    )
 
+    records = []
+    for guess_count, record in enumerate(guess_records(actual, guesses, budget_seconds), start=1):
+        records.append(record)
+        yield from format_guess_record(guess_count, record)
+
+    total_luck_score = game_luck(records)
     yield ""
     if total_luck_score > 1:
         yield f"Lucky game, by: {total_luck_score:.1f}x"
@@ -379,6 +1044,38 @@ def posthoc_analysis(actual, guesses):
         yield f"Unlucky game, by: {1 / total_luck_score:.1f}x"
 
 
+def what_if_analysis(actual, guesses, at, alternatives):
+    # What if guess #at had been one of the alternatives instead. The game is only played up to
+    # that guess once, then forked for each alternative.
+    state = new_game_state()
+    for guess in guesses[:at - 1]:
+        state = play_guess(state, guess, actual)
+    yield f"Before guess #{at}, {len(state.remaining)} words remained"
+
+    hard_guesses = hard_mode_index().legal_guesses(*state.rules)
+    played = guesses[at - 1]
+    for guess in [played, *alternatives]:
+        expected = state.expected_remaining(guess)
+        left = len(play_guess(state, guess, actual).remaining)
+        yield (
+            f"{'Played' if guess == played else 'What if'} {guess!r}: expected to leave"
+            f" {expected:.1f} words, and left {left}"
+            f"{'' if guess in hard_guesses else ' (not allowed in hard mode)'}"
+        )
+
+
+def pop_option(args, name, default):
+    # Remove "--name value" from the args, and return the value
+    if name in args:
+        idx = args.index(name)
+        if idx + 1 >= len(args):
+            raise ValueError(f"Missing value for {name}")
+        value = args[idx + 1]
+        return value, args[:idx] + args[idx + 2:]
+    else:
+        return default, args
+
+
 def to_words(raw):
     lowercase_args = [w.lower() for w in raw]
     lowercase_words = [''.join(l for l in w if l in string.ascii_lowercase) for w in lowercase_args]
@@ -475,10 +1172,56 @@ def to_words(raw):
 #       - yygny: solar 0.0
 
 if __name__ == '__main__':
+    import os
     import sys
     args = sys.argv
     if args[0] == 'python':
         args = args[1:]
+    # Let other modules import this one as "analysis", without running it a second time
+    sys.modules.setdefault('analysis', sys.modules[__name__])
+
+    import wordlists
+    if not wordlists.LOADED_FROM_INDEX:
+        wordlists.save_index()
+
+    workers, args = pop_option(args, '--workers', 1)
+    workers = int(workers)
+
+    # "--score-cache PATH" saves scores on disk, to share between runs
+    score_cache_path, args = pop_option(args, '--score-cache', None)
+    set_score_cache(score_cache_path)
+
+    # "--profile PATH" writes a JSON summary of the run to PATH at exit ("-" for stderr), and
+    # "--profile-interval SECONDS" adds a sampling profile
+    from profiling import PROFILE_ENV, PROFILE_INTERVAL_ENV
+    profile_path, args = pop_option(args, '--profile', os.environ.get(PROFILE_ENV))
+    profile_interval, args = pop_option(
+        args,
+        '--profile-interval',
+        os.environ.get(PROFILE_INTERVAL_ENV),
+    )
+    if profile_path or profile_interval:
+        import atexit
+        profiler = set_profiler(None if profile_interval is None else float(profile_interval))
+        atexit.register(lambda: profiler.write_summary(profile_path or '-', cache_stats()))
+
+    # Options for any subcommand, so they can go before or after it
+    depth, args = pop_option(args, '--depth', None)
+    depth = None if depth is None else int(depth)
+    if depth is not None and depth < 0:
+        sys.exit(f"--depth must be 0 or more, got {depth}")
+    budget_seconds, args = pop_option(args, '--budget', None)
+    budget_seconds = None if budget_seconds is None else float(budget_seconds)
+
+    if len(args) == 3 and args[1] == 'batch':
+        # batch runs whole games in parallel, instead of scoring guesses in parallel
+        from batch import print_batch
+        print_batch(args[2], workers, depth, budget_seconds)
+        sys.exit()
+    else:
+        set_workers(workers)
+    set_lookahead(depth)
+
     if len(args) > 1 and args[1] == 'test':
         assert calculate_remaining(["aoeuh"], "aoeuh", "") == 1
         assert calculate_remaining(["ab"], "ab", "ac") == 1  # Catch a bad closure
@@ -488,18 +1231,255 @@ if __name__ == '__main__':
         assert calculate_remaining(["baa", "bac"], "baa", "aab") == 1  # Catch a bad closure
         assert calculate_remaining(["baac", "baaa"], "baac", "aaab") == 1  # Catch a bad closure
         assert calculate_remaining(["ab"], "ab", "cb") == 1  # Catch a bad closure
+        for candidates, actual, guess in [
+            (["aoeuh", "aoeuz", "zoeuh"], "aoeuh", "hueoa"),
+            (["baa", "bac", "aab", "bca"], "baa", "aab"),
+            (["baac", "baaa", "aaab"], "baac", "aaab"),
+            (likely, "mummy", "yummy"),
+        ]:
+            compiled = get_remaining_compiled(candidates, actual, guess)
+            assert compiled == apply_filters(candidates, make_filters(actual, guess))
+        assert set_fingerprint(["bac", "baa"]) == set_fingerprint(frozenset(["baa", "bac"]))
+        assert set_fingerprint([""]) != set_fingerprint([])
+        assert patterns.feedback_pattern("speed", "abide") == 10  # yellow s, only one yellow e
+        assert patterns.compute_patterns(["speed"], ["abide"])[0, 0] == 10
+        # 11 letters have more patterns than fit in 16 bits
+        long_pattern = patterns.feedback_pattern("kbcdefghija", "abcdefghijk")
+        assert long_pattern > 2 ** 16
+        assert patterns.compute_patterns(["kbcdefghija"], ["abcdefghijk"])[0, 0] == long_pattern
+        assert calculate_remaining(likely, "rainy", "rales") == 19
+        bound_remaining = get_remaining_py(likely, "rainy", "bound")
+        assert set(get_remaining_patterns(likely, "rainy", "bound")) == bound_remaining
+
+        # Sampled scores should be unbiased: each row here is a different sample of the answers
+        from budget import sampled_scores
+        rng = np.random.default_rng(0)
+        all_answers = as_candidates(likely)
+        for opener in ["rales", "bound", "fuzzy"]:
+            row = patterns.default_matrix().row(opener)
+            samples = [rng.choice(len(row), SAMPLE_SIZE, replace=False) for _ in range(500)]
+            estimates, _ = sampled_scores(row[np.array(samples)], len(row))
+            exact = average_remaining(all_answers, opener)
+            assert abs(estimates.mean() - exact) < 0.01 * exact, (opener, estimates.mean(), exact)
+
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ScoreCache(f"{tmp}/scores.sqlite")
+            matrix = patterns.default_matrix()
+            guesses = ['rales', 'bound', 'rainy']
+            scores = cache.scores('test', [0, 1, 2], guesses, lambda g: matrix.score(g, [0, 1, 2]))
+            # a hit even with the guesses in another order, so calculating again would fail
+            cached = cache.scores('test', [0, 1, 2], guesses[::-1], lambda g: 1 / 0)
+            assert (cached.expected_remaining[::-1] == scores.expected_remaining).all()
+            assert cache.stats() == {'hits': 1, 'misses': 1, 'errors': 0}
+
+            # a corrupt header means rebuilding the table, not crashing
+            from tiled import TiledPatternTable
+            table_path = f"{tmp}/variant.patterns"
+            best_guesses = TiledPatternTable(table_path, guesses, guesses).best_guesses(3)
+            with open(f"{table_path}.json", 'w') as f:
+                f.write('{"fingerprint": ')
+            table = TiledPatternTable(table_path, guesses, guesses)
+            assert table.rows_done == 0
+            assert table.best_guesses(3) == best_guesses
+
+        state = new_game_state().play_against("rales", "rainy")
+        assert state.remaining == get_remaining_patterns(likely, "rainy", "rales")
+        assert state.undo().play_against("rales", "rainy") is state  # replaying is a lookup
+        assert state.expected_remaining("bound") == average_remaining(state.remaining, "bound")
+        assert state.play_against("bound", "rainy").rules == hard_mode_rules(
+            ["rales", "bound"],
+            [patterns.feedback_pattern(guess, "rainy") for guess in ["rales", "bound"]],
+        )
+        assert patterns.parse_pattern("nnygn") == 15 and patterns.format_pattern(15) == "nnygn"
+        # Branch-and-bound finds the same best and worst guesses as scoring every guess
+        matrix = patterns.default_matrix()
+        for remaining in [
+            as_candidates(likely),
+            get_remaining_patterns(likely, "mummy", "rales"),
+            get_remaining_patterns(likely, "rainy", "rales"),
+        ]:
+            answer_indices = matrix.answers.indices(remaining)
+            guesses = letter_frequency_order(remaining, likely)
+            scores = matrix.score(guesses, answer_indices).expected_remaining
+            scored = list(zip(scores.tolist(), guesses))
+            for worst, pick in [(False, min), (True, max)]:
+                pruned_score, pruned_guess = matrix.extreme_guess(guesses, answer_indices, worst)
+                scored_score, scored_guess = pick(scored)
+                assert pruned_guess == scored_guess, (worst, pruned_guess, scored_guess)
+                assert abs(pruned_score - scored_score) < 1e-9
+
+        # The opening book's follow-up guesses are the ones the AI would have picked anyway
+        original_book_path = BOOK_PATH
+        with tempfile.TemporaryDirectory() as tmp:
+            BOOK_PATH = f"{tmp}/book.sqlite"
+            load_opening_book.cache_clear()
+            try:
+                # few enough words left for easy mode after rainy, but not after mummy
+                states = [
+                    new_game_state().play_against("rales", actual) for actual in ["rainy", "mummy"]
+                ]
+                unbooked_guesses = [next_guess(state) for state in states]
+                follow_ups = [
+                    (
+                        "rales",
+                        state.patterns[0],
+                        calculate_guess_range(
+                            state.remaining,
+                            hard_mode_index().legal_guesses(*state.rules),
+                        ),
+                    )
+                    for state in states
+                ]
+                write_book(BOOK_PATH, opening_book_key(), [], follow_ups)
+                load_opening_book.cache_clear()
+                assert load_opening_book() is not None
+                for state, (unbooked_score, unbooked_guess) in zip(states, unbooked_guesses):
+                    booked_score, booked_guess = next_guess(state)
+                    assert booked_guess == unbooked_guess, (booked_guess, unbooked_guess)
+                    assert abs(booked_score - unbooked_score) < 1e-9
+            finally:
+                BOOK_PATH = original_book_path
+                load_opening_book.cache_clear()
+
+        # Exact lookahead on a few answers is the same as trying every sequence of guesses
+        from lookahead import EXACT_UP_TO, LookaheadSolver
+        small_answers = ["dummy", "gummy", "mummy", "rummy", "tummy", "yummy"]
+        small_pool = small_answers + ["tardy", "gumbo", "metro", "dirty", "youth", "mangy"]
+        assert len(small_answers) <= EXACT_UP_TO
+
+        @lru_cache(maxsize=None)
+        def exhaustive_guesses(remaining):
+            if len(remaining) <= 1:
+                return len(remaining)
+            best = float('inf')
+            for guess in small_pool:
+                buckets = defaultdict(list)
+                for answer in remaining:
+                    if answer != guess:
+                        buckets[patterns.feedback_pattern(guess, answer)].append(answer)
+                if any(len(bucket) == len(remaining) for bucket in buckets.values()):
+                    # tells nothing apart, so it never finishes
+                    continue
+                after = sum(
+                    len(bucket) * exhaustive_guesses(frozenset(bucket))
+                    for bucket in buckets.values()
+                )
+                best = min(best, 1 + after / len(remaining))
+            return best
+
+        solver = LookaheadSolver(patterns.default_matrix(), small_pool, CONSIDER_ALL_WORDS_MAXIMUM)
+        expected, best_guess = solver.solve(as_candidates(small_answers))
+        assert abs(expected - exhaustive_guesses(frozenset(small_answers))) < 1e-9
+        assert abs(solver.guess_cost(as_candidates(small_answers), best_guess) - expected) < 1e-9
+        try:
+            set_lookahead(-1)
+        except ValueError:
+            pass
+        else:
+            assert False, "Negative lookahead depth wasn't caught"
+
+        # Multi-board games score on the process pool too, and get the same result
+        from contextlib import redirect_stdout
+        from io import StringIO
+        import parallel
+        serial_output = StringIO()
+        with redirect_stdout(serial_output):
+            multi_answer_ai_play(["rainy", "mummy", "bound"])
+        # usable_workers() would skip the pool on a single CPU, and small rounds skip it anyway
+        minimum_pairs = parallel.PARALLEL_MINIMUM_PAIRS
+        parallel.PARALLEL_MINIMUM_PAIRS = 0
+        PARALLEL_SCORER = parallel.ParallelScorer(patterns.default_matrix(), 2)
+        try:
+            parallel_output = StringIO()
+            with redirect_stdout(parallel_output):
+                multi_answer_ai_play(["rainy", "mummy", "bound"])
+        finally:
+            set_workers(1)
+            parallel.PARALLEL_MINIMUM_PAIRS = minimum_pairs
+        assert parallel_output.getvalue() == serial_output.getvalue()
+
+        from assist import HintTree
+        rales_colors = patterns.feedback_pattern("rales", "rainy")
+        assert HintTree().hint(["rales"], [rales_colors]).remaining == 19
+        # a deeper hint only works out its own node, not the hints on the way down to it
+        hint_tree = HintTree()
+        bound_colors = patterns.feedback_pattern("bound", "rainy")
+        assert hint_tree.hint(["rales", "bound"], [rales_colors, bound_colors]).remaining == 1
+        assert len(hint_tree.nodes) == 1
+        try:
+            # bodhi doesn't fit ggnnn after rales, so it can't have been all green
+            impossible_colors = [patterns.parse_pattern("ggnnn"), patterns.ALL_GREEN]
+            HintTree().hint(["rales", "bodhi"], impossible_colors)
+        except ValueError:
+            pass
+        else:
+            assert False, "Impossible game wasn't caught"
     elif len(args) == 3 and args[1] == 'ai':
         ai_play(args[2])
     elif len(args) >= 3 and args[1] == 'ph':
         guesses = to_words(args[2:])
         actual = guesses[-1]
         try:
-            for line in posthoc_analysis(actual, guesses):
+            for line in posthoc_analysis(actual, guesses, budget_seconds):
                 print(line)
         except KeyboardInterrupt:
             print("\nAnalysis ended by Ctrl-C")
+    elif len(args) >= 2 and args[1] == 'hint':
+        from assist import print_hint
+        print_hint(args[2:])
+    elif len(args) >= 2 and args[1] == 'assist':
+        from assist import run_assist
+        opener, args = pop_option(args, '--opener', STARTING_WORD)
+        warm_depth, args = pop_option(args, '--warm', 0)
+        run_assist(to_words([opener])[0], int(warm_depth))
+    elif len(args) >= 3 and args[1] == 'whatif':
+        at, args = pop_option(args, '--at', 2)
+        alternatives, args = pop_option(args, '--try', '')
+        guesses = to_words(args[2:])
+        alternatives = to_words(alternatives.split(',')) if alternatives else []
+        at = int(at)
+        if not 1 <= at <= len(guesses):
+            raise ValueError(f"--at must be a guess number from 1 to {len(guesses)}")
+        for line in what_if_analysis(guesses[-1], guesses, at, alternatives):
+            print(line)
     elif len(args) > 3 and args[1] == 'mai':
         answers = to_words(args[2:])
         multi_answer_ai_play(answers)
+    elif len(args) >= 2 and args[1] == 'bench':
+        from benchmark import print_summary, run_benchmark, save_results
+        # time the calculations, not the lookups
+        set_score_cache(None)
+        sample, args = pop_option(args, '--sample', None)
+        seed, args = pop_option(args, '--seed', 0)
+        output, args = pop_option(args, '--output', None)
+        results = run_benchmark(None if sample is None else int(sample), int(seed))
+        print_summary(results)
+        if output is not None:
+            save_results(results, output)
+    elif len(args) >= 2 and args[1] == 'serve':
+        from server import DEFAULT_PORT, run_server
+        port, args = pop_option(args, '--port', DEFAULT_PORT)
+        socket_path, args = pop_option(args, '--socket', None)
+        run_server(port=int(port), socket_path=socket_path)
+    elif len(args) >= 3 and args[1] == 'variant':
+        from tiled import DEFAULT_MEMORY_LIMIT, print_best_openers
+        table_path, args = pop_option(args, '--table', 'variant.patterns')
+        memory_mb, args = pop_option(args, '--memory-mb', DEFAULT_MEMORY_LIMIT // 2 ** 20)
+        top, args = pop_option(args, '--top', 10)
+        print_best_openers(
+            args[2],
+            args[3] if len(args) > 3 else None,
+            table_path,
+            int(memory_mb) * 2 ** 20,
+            int(top),
+        )
+    elif len(args) >= 2 and args[1] == 'book':
+        openers = to_words(args[2:]) or [STARTING_WORD]
+        build_opening_book(openers)
     else:
-        print(f"Invoke with test, ai, mai (2+ answers), or ph. Got: %{args}")
+        print(
+            "Invoke with test, ai, mai (2+ answers), ph, hint, assist, whatif, book, batch, bench,"
+            " serve, or variant,"
+            f" optionally with --workers N, --depth N or --budget SECONDS. Got: %{args}"
+        )
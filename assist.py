@@ -0,0 +1,154 @@
+from collections import namedtuple
+
+from analysis import STARTING_WORD, new_game_state, next_guess, to_words
+from cache import BoundedCache
+from patterns import parse_pattern
+
+
+# Hints kept in memory, keyed by the guesses and colors so far
+HINT_CACHE_MAX_ENTRIES = 100_000
+
+ASSIST_HELP = (
+    "After each guess, type the colors you got: n for gray, y for yellow, g for green (like"
+    " nnygn). If you played some other word, type the word and then its colors. Type undo to take"
+    " back the last guess, or nothing to quit."
+)
+
+# guess is None once the game is solved. remaining is how many answers still fit the colors.
+Hint = namedtuple('Hint', ['guess', 'expected_remaining', 'remaining'])
+
+
+class HintTree:
+    # Hints for games in progress, from just the guesses and the colors they showed, without
+    # knowing the answer. It's a decision tree: the opener, then each pattern, then the best guess
+    # after it, and so on. Each node is worked out the first time a game reaches it, and kept, so
+    # hints for common positions come straight back from the tree.
+
+    def __init__(self, opener=STARTING_WORD, max_entries=HINT_CACHE_MAX_ENTRIES):
+        self.opener = opener
+        self.root = new_game_state()
+        # (guesses, patterns) -> (GameState, Hint). Holding a state keeps its parents alive too,
+        # so walking down to a new node reuses the states of the games played so far.
+        self.nodes = BoundedCache(max_entries=max_entries)
+
+    def node(self, guesses, patterns):
+        key = (guesses, patterns)
+        node = self.nodes.get(key)
+        if node is None:
+            # Only this node's hint is needed, so walk down to it through the states alone. Each
+            # step is a lookup if the state is still around, and a bitset AND if not.
+            state = self.root
+            for guess, pattern in zip(guesses, patterns):
+                state = state.play(guess, pattern)
+            node = (state, self.calculate(state))
+            self.nodes.put(key, node)
+        return node
+
+    def calculate(self, state):
+        if state.is_solved():
+            return Hint(None, 0, 0)
+
+        num_remaining = len(state.remaining)
+        if num_remaining == 0:
+            raise ValueError("No answers in the word list show those colors")
+        elif not state.guesses:
+            return Hint(self.opener, state.expected_remaining(self.opener), num_remaining)
+        elif num_remaining == 1:
+            return Hint(next(iter(state.remaining)), 0, num_remaining)
+        else:
+            expected_remaining, guess = next_guess(state)
+            return Hint(guess, expected_remaining, num_remaining)
+
+    def hint(self, guesses=(), patterns=()):
+        # The best next guess, after the guesses showed patterns (as numbers)
+        return self.node(tuple(guesses), tuple(patterns))[1]
+
+    def grow(self, guesses=(), patterns=(), depth=1):
+        # Fill in the tree ahead of time: the hint for every pattern the suggested guesses could
+        # show, depth guesses deep
+        state, hint = self.node(tuple(guesses), tuple(patterns))
+        if depth <= 0 or hint.guess is None or hint.remaining <= 1:
+            return
+        for pattern in state.partition(hint.guess):
+            self.grow((*guesses, hint.guess), (*patterns, pattern), depth - 1)
+
+
+def parse_game(raw):
+    # "rales nnygn bound ggnng" -> (guesses, patterns)
+    if len(raw) % 2:
+        raise ValueError("Give each guess followed by its colors, like: rales nnygn bound ggnng")
+    guesses = to_words(raw[0::2])
+    patterns = [parse_pattern(colors) for colors in raw[1::2]]
+    return guesses, patterns
+
+
+def describe_hint(hint, is_first=False):
+    if hint.guess is None:
+        return "Solved!"
+    elif is_first:
+        return f"Play {hint.guess!r}"
+    elif hint.remaining == 1:
+        return f"It must be {hint.guess!r}"
+    else:
+        return (
+            f"{hint.remaining} words left. Play {hint.guess!r}, leaving"
+            f" {hint.expected_remaining:.1f} words on average"
+        )
+
+
+def print_hint(raw):
+    try:
+        guesses, patterns = parse_game(raw)
+        hint = HintTree().hint(guesses, patterns)
+    except ValueError as exc:
+        print(exc)
+    else:
+        print(describe_hint(hint, not guesses))
+
+
+def run_assist(opener=STARTING_WORD, warm_depth=0):
+    tree = HintTree(opener)
+    if warm_depth:
+        print("Working out the hints ahead of time...", flush=True)
+        tree.grow(depth=warm_depth)
+    print(ASSIST_HELP)
+
+    guesses, patterns = [], []
+    while True:
+        try:
+            hint = tree.hint(guesses, patterns)
+        except ValueError as exc:
+            print(f"{exc}, so taking back the last guess")
+            guesses.pop()
+            patterns.pop()
+            continue
+
+        print(describe_hint(hint, not guesses))
+        if hint.guess is None:
+            return
+
+        try:
+            words = input("> ").split()
+        except EOFError:
+            return
+        if not words:
+            return
+        elif words == ['undo']:
+            if guesses:
+                guesses.pop()
+                patterns.pop()
+            continue
+
+        try:
+            if len(words) == 1:
+                guess, pattern = hint.guess, parse_pattern(words[0])
+            elif len(words) == 2:
+                guess, pattern = to_words(words[:1])[0], parse_pattern(words[1])
+            else:
+                raise ValueError("Type the colors, or a word and its colors")
+        except ValueError as exc:
+            print(exc)
+            continue
+
+        guesses.append(guess)
+        patterns.append(pattern)
@@ -0,0 +1,97 @@
+from collections import defaultdict
+from contextlib import nullcontext
+import csv
+from functools import partial
+from itertools import islice
+import json
+from multiprocessing import Pool
+import sys
+
+from analysis import game_luck, guess_records, set_lookahead, to_words
+import patterns
+from parallel import usable_workers
+from wordlists import likely
+
+
+# How many games run_batch() reads ahead with --workers. Results come out a chunk at a time.
+BATCH_CHUNK_GAMES = 1000
+
+
+def read_games(lines):
+    # Each line is either JSON like {"answer": "rainy", "guesses": ["rales", "rainy"], "id": 7},
+    # or CSV like: rainy,rales,rainy (the answer, then the guesses). Bad lines are returned as
+    # a record with an "error", so they show up in the output.
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        try:
+            if line.startswith('{'):
+                record = json.loads(line)
+                game_id = record.get('id')
+                raw_words = [record['answer'], *record['guesses']]
+            else:
+                game_id = None
+                raw_words = next(csv.reader([line]))
+
+            answer, *guesses = to_words(raw_words)
+            if not guesses:
+                raise ValueError("No guesses in game")
+        except (ValueError, KeyError, TypeError, AttributeError) as exc:
+            yield {'line': line_number, 'error': f"{type(exc).__name__}: {exc}"}
+        else:
+            yield {'line': line_number, 'id': game_id, 'answer': answer, 'guesses': guesses}
+
+
+def analyze_game(game, budget_seconds=None):
+    # The same analysis as posthoc_analysis(), as a dict instead of lines of text
+    rounds = list(guess_records(game['answer'], game['guesses'], budget_seconds))
+    return {**game, 'rounds': rounds, 'luck': game_luck(rounds)}
+
+
+def analyze_games(games, budget_seconds=None):
+    return [analyze_game(game, budget_seconds) for game in games]
+
+
+def run_batch(lines, workers=1, depth=None, budget_seconds=None):
+    # Yields one record per game, in the same order as the input. Only BATCH_CHUNK_GAMES games
+    # are read ahead at a time, so memory stays flat however long the input is. depth and
+    # budget_seconds are the same as --depth and --budget for ph, with the budget per game.
+    games = read_games(lines)
+    set_lookahead(depth)
+    workers = usable_workers(workers)
+    if workers <= 1:
+        for game in games:
+            yield game if 'error' in game else analyze_game(game, budget_seconds)
+        return
+
+    # Compute the common part of the pattern matrix once, before the workers fork off
+    matrix = patterns.default_matrix()
+    matrix.compute_rows(matrix.guess_indices(likely))
+    # Each worker sets up its own lookahead, rather than relying on inheriting it from a fork
+    with Pool(workers, initializer=set_lookahead, initargs=(depth,)) as pool:
+        while True:
+            chunk = list(islice(games, BATCH_CHUNK_GAMES))
+            if not chunk:
+                return
+            # Games in the chunk with the same answer are analyzed together, in the same process,
+            # so they can share their best/worst guesses
+            positions_by_answer = defaultdict(list)
+            for position, game in enumerate(chunk):
+                if 'error' not in game:
+                    positions_by_answer[game['answer']].append(position)
+            groups = list(positions_by_answer.values())
+            group_games = ([chunk[position] for position in group] for group in groups)
+            analyze = partial(analyze_games, budget_seconds=budget_seconds)
+            for group, records in zip(groups, pool.imap(analyze, group_games)):
+                for position, record in zip(group, records):
+                    chunk[position] = record
+            yield from chunk
+
+
+def print_batch(path, workers=1, depth=None, budget_seconds=None):
+    # path can be '-' to read games from stdin
+    with (nullcontext(sys.stdin) if path == '-' else open(path)) as lines:
+        for record in run_batch(lines, workers, depth, budget_seconds):
+            print(json.dumps(record), flush=True)
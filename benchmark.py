@@ -0,0 +1,175 @@
+from collections import Counter, defaultdict
+import json
+import random
+import time
+
+import analysis
+from analysis import (
+    ai_guesses,
+    apply_compiled_filters,
+    apply_filters,
+    get_remaining_patterns,
+    make_filters,
+)
+import wordlists
+
+
+# A game that takes more guesses than this is a failure
+MAX_GUESSES = 6
+
+# How many (candidates, answer, guess) calls to time each elimination backend with
+BACKEND_WORKLOAD_SIZE = 200
+
+
+# The filter-based backends, without the cache of remaining words that analysis puts in front of
+# them. Timing through the cache would charge them for its keys and bookkeeping, which the
+# patterns backend never pays.
+def filter_py(candidates, actual, guess):
+    return apply_filters(candidates, make_filters(actual, guess))
+
+
+def filter_lib(candidates, actual, guess):
+    from wordle_rs import get_remaining as get_remaining_rs
+    return get_remaining_rs(set(candidates), actual, guess)
+
+
+def filter_compiled(candidates, actual, guess):
+    return apply_compiled_filters(candidates, make_filters(actual, guess))
+
+
+BACKENDS = {
+    'py': filter_py,
+    'lib': filter_lib,
+    'compiled': filter_compiled,
+    'patterns': get_remaining_patterns,
+}
+
+
+def simulate_game(actual):
+    round_times = []
+    guesses = []
+    start = time.perf_counter()
+    for guess, _, _ in ai_guesses(actual):
+        now = time.perf_counter()
+        round_times.append(now - start)
+        guesses.append(guess)
+        start = now
+
+    return {
+        'answer': actual,
+        'guesses': guesses,
+        'solved': guesses[-1] == actual and len(guesses) <= MAX_GUESSES,
+        'round_seconds': round_times,
+    }
+
+
+def simulate(answers):
+    games = []
+    start = time.perf_counter()
+    for actual in answers:
+        games.append(simulate_game(actual))
+    total_seconds = time.perf_counter() - start
+
+    guess_counts = Counter(len(game['guesses']) for game in games if game['solved'])
+    seconds_by_round = defaultdict(list)
+    for game in games:
+        for round_number, seconds in enumerate(game['round_seconds'], start=1):
+            seconds_by_round[round_number].append(seconds)
+    num_solved = sum(guess_counts.values())
+
+    return {
+        'games': len(games),
+        'guess_distribution': dict(sorted(guess_counts.items())),
+        'failures': [game['answer'] for game in games if not game['solved']],
+        'failure_rate': 1 - num_solved / len(games) if games else 0,
+        'average_guesses': (
+            sum(count * num for count, num in guess_counts.items()) / num_solved
+            if num_solved else None
+        ),
+        'total_seconds': total_seconds,
+        'seconds_per_game': total_seconds / len(games) if games else None,
+        'seconds_per_round': {
+            round_number: sum(times) / len(times)
+            for round_number, times in sorted(seconds_by_round.items())
+        },
+    }
+
+
+def backend_workload(rng, size):
+    # Every backend gets exactly these calls: a mix of the full dictionary and the smaller sets
+    # that come up later in a game
+    all_candidates = sorted(wordlists.likely)
+    workload = []
+    for _ in range(size):
+        actual = rng.choice(all_candidates)
+        first_remaining = get_remaining_patterns(all_candidates, actual, analysis.STARTING_WORD)
+        candidates = rng.choice([all_candidates, sorted(first_remaining)])
+        guess = rng.choice(all_candidates)
+        workload.append((frozenset(candidates), actual, guess))
+    return workload
+
+
+def time_backends(workload):
+    results = {}
+    for name, backend in BACKENDS.items():
+        try:
+            start = time.perf_counter()
+            for candidates, actual, guess in workload:
+                backend(candidates, actual, guess)
+            seconds = time.perf_counter() - start
+        except ImportError as exc:
+            results[name] = {'error': str(exc)}
+        else:
+            results[name] = {
+                'calls': len(workload),
+                'total_seconds': seconds,
+                'seconds_per_call': seconds / len(workload) if workload else None,
+            }
+    return results
+
+
+def run_benchmark(sample=None, seed=0, backends=True):
+    rng = random.Random(seed)
+    answers = list(wordlists.answers)
+    if sample is not None and sample < len(answers):
+        answers = rng.sample(answers, sample)
+
+    results = {
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {
+            'sample': sample,
+            'seed': seed,
+            'starting_word': analysis.STARTING_WORD,
+            'consider_all_words_maximum': analysis.CONSIDER_ALL_WORDS_MAXIMUM,
+            'prune_from_size': analysis.PRUNE_FROM_SIZE,
+            'opening_book': analysis.load_opening_book() is not None,
+        },
+        'simulation': simulate(answers),
+    }
+    if backends:
+        results['backends'] = time_backends(backend_workload(rng, BACKEND_WORKLOAD_SIZE))
+    return results
+
+
+def print_summary(results):
+    simulation = results['simulation']
+    print(f"Played {simulation['games']} games in {simulation['total_seconds']:.1f}s")
+    print(f"Guess distribution: {simulation['guess_distribution']}")
+    if simulation['average_guesses'] is not None:
+        print(f"Average guesses (when solved): {simulation['average_guesses']:.3f}")
+    print(f"Failure rate: {simulation['failure_rate']:.2%} {simulation['failures']}")
+    if simulation['seconds_per_game'] is not None:
+        print(f"Time per game: {simulation['seconds_per_game'] * 1000:.1f}ms")
+    for round_number, seconds in simulation['seconds_per_round'].items():
+        print(f"   round #{round_number}: {seconds * 1000:.1f}ms")
+
+    for name, timing in results.get('backends', {}).items():
+        if 'error' in timing:
+            print(f"Backend {name!r}: unavailable ({timing['error']})")
+        else:
+            print(f"Backend {name!r}: {timing['seconds_per_call'] * 1e6:.0f}µs per call")
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
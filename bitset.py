@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class WordIndex:
+    # A fixed, ordered list of words. Sets of these words can be stored as WordSet bitsets, where
+    # bit i is set if self.words[i] is in the set.
+
+    def __init__(self, words):
+        self.words = list(words)
+        self.positions = {word: idx for idx, word in enumerate(self.words)}
+
+    def __len__(self):
+        return len(self.words)
+
+    def covers(self, words):
+        if isinstance(words, WordSet):
+            return words.index is self
+        else:
+            return all(word in self.positions for word in words)
+
+    def indices(self, words):
+        if isinstance(words, WordSet) and words.index is self:
+            return words.indices()
+        else:
+            return np.fromiter((self.positions[word] for word in words), dtype=np.intp)
+
+    def from_mask(self, mask):
+        # mask is a bool array with one entry per word in the index
+        packed = np.packbits(mask, bitorder='little')
+        return WordSet(self, int.from_bytes(packed.tobytes(), 'little'))
+
+    def word_set(self, words):
+        if isinstance(words, WordSet) and words.index is self:
+            return words
+        else:
+            mask = np.zeros(len(self.words), dtype=bool)
+            mask[self.indices(words)] = True
+            return self.from_mask(mask)
+
+    def everything(self):
+        return WordSet(self, (1 << len(self.words)) - 1)
+
+
+class WordSet:
+    # An immutable set of words from a WordIndex, packed into the bits of a python int. Set
+    # operations and len() work on 64 words at a time.
+
+    __slots__ = ('index', 'bits')
+
+    def __init__(self, index, bits):
+        self.index = index
+        self.bits = bits
+
+    def _check_index(self, other):
+        if not isinstance(other, WordSet):
+            raise TypeError(f"Can only combine a WordSet with another WordSet, got {other!r}")
+        elif other.index is not self.index:
+            raise ValueError("Can't combine WordSets from different word indices")
+
+    def __and__(self, other):
+        self._check_index(other)
+        return WordSet(self.index, self.bits & other.bits)
+
+    def __or__(self, other):
+        self._check_index(other)
+        return WordSet(self.index, self.bits | other.bits)
+
+    def __sub__(self, other):
+        self._check_index(other)
+        return WordSet(self.index, self.bits & ~other.bits)
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def __bool__(self):
+        return self.bits != 0
+
+    def __contains__(self, word):
+        position = self.index.positions.get(word)
+        return position is not None and bool(self.bits >> position & 1)
+
+    def __iter__(self):
+        words = self.index.words
+        return (words[idx] for idx in self.indices())
+
+    def __eq__(self, other):
+        if isinstance(other, WordSet):
+            return self.index is other.index and self.bits == other.bits
+        else:
+            return NotImplemented
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __repr__(self):
+        return f"WordSet({set(self)!r})"
+
+    def mask(self):
+        num_words = len(self.index)
+        packed = np.frombuffer(self.bits.to_bytes((num_words + 7) // 8, 'little'), dtype=np.uint8)
+        return np.unpackbits(packed, count=num_words, bitorder='little').view(bool)
+
+    def indices(self):
+        return np.flatnonzero(self.mask())
@@ -0,0 +1,163 @@
+import time
+
+import numpy as np
+
+from patterns import (
+    ALL_GREEN,
+    ROW_CHUNK_SIZE,
+    bucket_histograms,
+    compute_patterns,
+    score_pattern_rows,
+)
+
+
+# How many answers to score against, when there isn't time to score against all of them
+SAMPLE_SIZE = 300
+
+# For 95% confidence intervals on sampled scores
+CONFIDENCE_Z = 1.96
+
+
+class Throughput:
+    # Running estimate of how many (guess, answer) pairs per second some kind of work gets through.
+    # Starts from a rough guess, and moves toward whatever gets measured.
+
+    def __init__(self, pairs_per_second):
+        self.pairs_per_second = pairs_per_second
+
+    def seconds(self, num_pairs):
+        return num_pairs / self.pairs_per_second
+
+    def record(self, num_pairs, seconds):
+        # tiny amounts of work are mostly overhead, and would make the estimate too pessimistic
+        if num_pairs >= 10_000 and seconds > 0:
+            self.pairs_per_second = (self.pairs_per_second + num_pairs / seconds) / 2
+
+
+# Computing patterns that aren't in the matrix yet (or gathering the ones that are), vs scoring
+# them. Measured with scan_scores() on the default tables, over every guess and answer.
+PATTERN_THROUGHPUT = Throughput(20_000_000)
+SCORE_THROUGHPUT = Throughput(200_000_000)
+
+
+class ScoringBudget:
+    # Wall-clock time allowed for analysing one game
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.deadline = time.perf_counter() + seconds
+
+    def seconds_left(self):
+        return max(0.0, self.deadline - time.perf_counter())
+
+    def expired(self):
+        return time.perf_counter() >= self.deadline
+
+
+def estimate_seconds(matrix, guess_indices, num_answers):
+    num_missing = np.count_nonzero(~matrix.is_computed[guess_indices])
+    return (
+        PATTERN_THROUGHPUT.seconds(num_missing * num_answers)
+        + SCORE_THROUGHPUT.seconds(len(guess_indices) * num_answers)
+    )
+
+
+def interleaved_chunks(guess_indices):
+    # Guesses should be sorted most promising first. Taking chunks alternately from the front and
+    # the back means a scan that gets cut short has still seen the likeliest best and worst guesses.
+    chunks = [
+        guess_indices[start:start + ROW_CHUNK_SIZE]
+        for start in range(0, len(guess_indices), ROW_CHUNK_SIZE)
+    ]
+    front, back = 0, len(chunks) - 1
+    while front <= back:
+        yield front * ROW_CHUNK_SIZE, chunks[front]
+        if front < back:
+            yield back * ROW_CHUNK_SIZE, chunks[back]
+        front += 1
+        back -= 1
+
+
+def sampled_scores(pattern_rows, num_answers):
+    # pattern_rows are against a uniform sample of the answers. For each sampled answer, the other
+    # sampled answers in its bucket estimate how many of the other answers share its bucket, so
+    # 1 + (c - 1)(N - 1)/(s - 1) is an unbiased estimate of the words it would leave. (Scaling the
+    # whole bucket by N/s counts the answer itself N/s times, and overestimates.) The mean of those
+    # estimates the expected remaining words.
+    #
+    # Those estimates share their bucket counts, so their spread understates the error. The
+    # interval comes from the jackknife instead: the score with each sampled answer left out.
+    sample_size = pattern_rows.shape[1]
+    histograms = bucket_histograms(pattern_rows)
+    counts = np.take_along_axis(histograms, pattern_rows.astype(np.intp), axis=1)
+    is_green = pattern_rows == ALL_GREEN
+    histograms[:, ALL_GREEN] = 0
+    # ordered pairs of different sampled answers in the same (not green) bucket
+    num_pairs = (histograms * (histograms - 1)).sum(axis=1)
+    num_not_green = sample_size - is_green.sum(axis=1)
+
+    def estimate(sample_size, num_not_green, num_pairs):
+        if sample_size == 1:
+            # nothing to compare with, so every answer that isn't the guess leaves at least itself
+            return num_not_green * 1.0
+        pair_weight = (num_answers - 1) / (sample_size * (sample_size - 1))
+        return num_not_green / sample_size + pair_weight * num_pairs
+
+    scores = estimate(sample_size, num_not_green, num_pairs)
+    if sample_size <= 2:
+        return scores, np.full(len(scores), np.inf)
+
+    left_out = estimate(
+        sample_size - 1,
+        num_not_green[:, None] - ~is_green,
+        num_pairs[:, None] - 2 * (counts - 1) * ~is_green,
+    )
+    variances = (sample_size - 1) * left_out.var(axis=1)
+    # sampled without replacement, so the interval shrinks to nothing as the sample grows
+    finite_population = max(0.0, 1 - sample_size / num_answers)
+    return scores, CONFIDENCE_Z * np.sqrt(variances * finite_population)
+
+
+def scan_scores(matrix, guess_indices, answer_indices, budget, sample_size=None):
+    # Expected remaining words for each guess, until the budget runs out. Guesses that weren't
+    # scored in time are NaN. With a sample_size, scores are estimated from that many answers,
+    # and come with the half-width of a confidence interval.
+    #
+    # Returns (scores, intervals), lined up with guess_indices
+    num_answers = len(answer_indices)
+    if sample_size is not None and sample_size < num_answers:
+        rng = np.random.default_rng(num_answers)
+        answer_indices = np.sort(rng.choice(answer_indices, sample_size, replace=False))
+    else:
+        sample_size = None
+    answer_words = [matrix.answers.words[idx] for idx in answer_indices]
+
+    scores = np.full(len(guess_indices), np.nan)
+    intervals = np.full(len(guess_indices), np.nan)
+    for offset, chunk in interleaved_chunks(guess_indices):
+        if budget.expired():
+            break
+
+        # Rows missing from the matrix only get computed against the answers needed here, which
+        # is much quicker than filling in the matrix, when there aren't many answers
+        start = time.perf_counter()
+        missing = ~matrix.is_computed[chunk]
+        rows = np.empty((len(chunk), len(answer_indices)), dtype=np.uint8)
+        rows[~missing] = matrix.patterns[chunk[~missing]][:, answer_indices]
+        missing_words = [matrix.guess_words[idx] for idx in chunk[missing]]
+        if missing_words:
+            rows[missing] = compute_patterns(missing_words, answer_words)
+        computed = time.perf_counter()
+        if sample_size is None:
+            chunk_scores = score_pattern_rows(rows).expected_remaining
+            chunk_intervals = np.zeros(len(chunk))
+        else:
+            chunk_scores, chunk_intervals = sampled_scores(rows, num_answers)
+        scored = time.perf_counter()
+
+        PATTERN_THROUGHPUT.record(len(missing_words) * len(answer_words), computed - start)
+        SCORE_THROUGHPUT.record(len(chunk) * len(answer_indices), scored - computed)
+        scores[offset:offset + len(chunk)] = chunk_scores
+        intervals[offset:offset + len(chunk)] = chunk_intervals
+
+    return scores, intervals
@@ -0,0 +1,127 @@
+from collections import OrderedDict
+import hashlib
+import sys
+
+from bitset import WordSet
+
+
+# Rough bookkeeping cost of one entry, on top of its key and value: the OrderedDict node, the
+# (value, size) tuple, etc.
+ENTRY_OVERHEAD_BYTES = 200
+
+# How many frozensets to remember the fingerprint of
+FINGERPRINT_MEMO_ENTRIES = 64
+
+
+def words_digest(words):
+    # Full-width blake2b of the sorted words, so two different sets sharing a digest isn't a
+    # practical concern. The count keeps {''} apart from the empty set.
+    joined = '\n'.join(sorted(words))
+    return hashlib.blake2b(f"{len(words)}\n{joined}".encode()).digest()
+
+
+def set_fingerprint(words):
+    # An order-independent key for a set of words, small enough that cache entries don't each hold
+    # a copy of a big candidate set. It has to be exact: two different sets sharing a key would
+    # hand out the wrong cached result, with no error.
+    if isinstance(words, WordSet):
+        # already a compact, exact handle
+        return words
+    elif isinstance(words, frozenset):
+        # Scoring looks up the same frozenset of candidates once per guess and answer, so only
+        # sort and digest it once. The entry keeps the set alive, so its id can't be reused.
+        memo = FINGERPRINT_MEMO.get(id(words))
+        if memo is not None and memo[0] is words:
+            return memo[1]
+        digest = words_digest(words)
+        FINGERPRINT_MEMO.put(id(words), (words, digest))
+        return digest
+    else:
+        return words_digest(set(words))
+
+
+def deep_sizeof(value):
+    # sys.getsizeof() only counts a container itself, not what's in it. This counts the contents
+    # of the containers that get cached (sets of words, tuples of filters, and so on) too.
+    size = sys.getsizeof(value)
+    if isinstance(value, WordSet):
+        size += sys.getsizeof(value.bits)
+    elif isinstance(value, dict):
+        size += sum(deep_sizeof(key) + deep_sizeof(item) for key, item in value.items())
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        size += sum(deep_sizeof(item) for item in value)
+    return size
+
+
+class BoundedCache:
+    # An LRU cache that evicts when it goes over either a count of entries or an estimated number
+    # of bytes. Either limit can be None, to disable it.
+
+    def __init__(self, max_bytes=None, max_entries=None, sizeof=deep_sizeof):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+        else:
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)[1]
+
+        entry_bytes = self.sizeof(key) + self.sizeof(value) + ENTRY_OVERHEAD_BYTES
+        self.entries[key] = (value, entry_bytes)
+        self.total_bytes += entry_bytes
+        self.evict()
+
+    def evict(self):
+        while self.entries and self.is_over_budget():
+            _, (_, entry_bytes) = self.entries.popitem(last=False)
+            self.total_bytes -= entry_bytes
+            self.evictions += 1
+
+    def is_over_budget(self):
+        if self.max_entries is not None and len(self.entries) > self.max_entries:
+            return True
+        elif self.max_bytes is not None and self.total_bytes > self.max_bytes:
+            return True
+        else:
+            return False
+
+    def resize(self, max_bytes=None, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.evict()
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'max_entries': self.max_entries,
+        }
+
+
+# Digests of recently seen frozensets, by id. Sizes aren't tracked, just the count of entries.
+FINGERPRINT_MEMO = BoundedCache(max_entries=FINGERPRINT_MEMO_ENTRIES, sizeof=lambda value: 0)
@@ -0,0 +1,123 @@
+import weakref
+
+import numpy as np
+
+from bitset import WordSet
+from hard_mode import hard_mode_rules
+from patterns import ALL_GREEN, feedback_pattern
+
+
+class GameState:
+    # One point in a game: the guesses so far, the patterns they showed, and the answers that are
+    # still possible (as a WordSet over the matrix's answers).
+    #
+    # States never change once made. Playing a guess returns a new state that points back to this
+    # one, so undo is just going back to the parent, and forking to explore another guess is free.
+    # Whatever gets worked out for a state is kept on it: how each guess evaluated here splits the
+    # answers, and the states after each (guess, pattern) played from here. So trying one guess,
+    # backing up and trying another never redoes any work. States only hold on to the states after
+    # them weakly, so a long-lived starting state doesn't keep every game ever played alive.
+
+    def __init__(self, matrix, remaining, guesses=(), patterns=(), parent=None, rules=None):
+        self.matrix = matrix
+        self.remaining = remaining
+        self.guesses = guesses
+        self.patterns = patterns
+        self.parent = parent
+        # the hard-mode constraints, as ({position: letter}, {letter: minimum count})
+        self.rules = ({}, {}) if rules is None else rules
+        self.partitions = {}
+        self.children = weakref.WeakValueDictionary()
+        self._answer_indices = None
+
+    @classmethod
+    def start(cls, matrix):
+        return cls(matrix, matrix.answers.everything())
+
+    def __len__(self):
+        return len(self.guesses)
+
+    def is_solved(self):
+        return bool(self.patterns) and self.patterns[-1] == ALL_GREEN
+
+    def answer_indices(self):
+        if self._answer_indices is None:
+            self._answer_indices = self.matrix.answers.indices(self.remaining)
+        return self._answer_indices
+
+    def partition(self, guess):
+        # How the remaining answers would split up by pattern, if guess was next. Returns
+        # {pattern: WordSet}, without the all-green pattern.
+        partition = self.partitions.get(guess)
+        if partition is None:
+            answer_indices = self.answer_indices()
+            row = self.matrix.row(guess)[answer_indices]
+            partition = {}
+            for pattern in np.unique(row).tolist():
+                if pattern != ALL_GREEN:
+                    mask = np.zeros(len(self.matrix.answers), dtype=bool)
+                    mask[answer_indices[row == pattern]] = True
+                    partition[pattern] = self.matrix.answers.from_mask(mask)
+            self.partitions[guess] = partition
+        return partition
+
+    def expected_remaining(self, guess):
+        # Same as the score from the pattern matrix, from the partition
+        num_answers = len(self.remaining)
+        if num_answers == 0:
+            return 0
+        sizes = [len(bucket) for bucket in self.partition(guess).values()]
+        return sum(size * size for size in sizes) / num_answers
+
+    def play(self, guess, pattern):
+        # The state after guess showed pattern. After the all-green pattern, no words remain.
+        if pattern == ALL_GREEN and guess not in self.remaining:
+            raise ValueError(f"{guess!r} can't be the answer, it doesn't fit the colors so far")
+        return self.child(guess, pattern)
+
+    def play_against(self, guess, actual):
+        # The colors come from the answer, so they always fit, even for an answer outside the
+        # word list
+        return self.child(guess, feedback_pattern(guess, actual))
+
+    def child(self, guess, pattern):
+        child = self.children.get((guess, pattern))
+        if child is None:
+            nothing = WordSet(self.matrix.answers, 0)
+            if pattern == ALL_GREEN:
+                remaining = nothing
+            elif guess in self.partitions:
+                remaining = self.partitions[guess].get(pattern, nothing)
+            else:
+                remaining = self.remaining & self.matrix.matching(guess, pattern)
+
+            # only the new guess can add to the constraints so far
+            greens, minimum_counts = hard_mode_rules([guess], [pattern])
+            old_greens, old_minimum_counts = self.rules
+            greens = {**old_greens, **greens}
+            for letter, count in old_minimum_counts.items():
+                minimum_counts[letter] = max(minimum_counts.get(letter, 0), count)
+
+            child = GameState(
+                self.matrix,
+                remaining,
+                self.guesses + (guess,),
+                self.patterns + (pattern,),
+                self,
+                (greens, minimum_counts),
+            )
+            self.children[guess, pattern] = child
+        return child
+
+    def undo(self):
+        # The state before the last guess, or this one at the start of the game
+        return self if self.parent is None else self.parent
+
+    def history(self):
+        # Every state from the start of the game up to this one
+        states = []
+        state = self
+        while state is not None:
+            states.append(state)
+            state = state.parent
+        return states[::-1]
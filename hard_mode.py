@@ -0,0 +1,72 @@
+import numpy as np
+
+from bitset import WordIndex
+from patterns import GREEN, WORD_LENGTH, YELLOW, encode_words, feedback_pattern
+
+
+def pattern_colors(pattern):
+    # The color of each letter, first letter first
+    colors = []
+    for _ in range(WORD_LENGTH):
+        pattern, color = divmod(pattern, 3)
+        colors.append(color)
+    return colors[::-1]
+
+
+def hard_mode_rules(guesses, patterns):
+    # What hard mode requires of the next guess: every green letter in the same spot, and at
+    # least as many of each letter as any one guess revealed (green or yellow).
+    #
+    # Returns ({position: letter}, {letter: minimum count})
+    greens = {}
+    minimum_counts = {}
+    for guess, pattern in zip(guesses, patterns):
+        revealed_counts = {}
+        for idx, (letter, color) in enumerate(zip(guess, pattern_colors(pattern))):
+            if color == GREEN:
+                greens[idx] = letter
+            if color in (GREEN, YELLOW):
+                revealed_counts[letter] = revealed_counts.get(letter, 0) + 1
+        for letter, count in revealed_counts.items():
+            minimum_counts[letter] = max(minimum_counts.get(letter, 0), count)
+    return greens, minimum_counts
+
+
+class HardModeIndex:
+    # Inverted index over a dictionary, to find the guesses hard mode allows without checking every
+    # word. There's a posting list (as a WordSet) for each letter in each position, and for each
+    # letter appearing at least n times. The legal guesses are the intersection of the lists that
+    # the rules call for.
+
+    def __init__(self, words):
+        self.words = WordIndex(sorted(words))
+        letters = encode_words(self.words.words)
+
+        self.at_position = {}
+        for idx in range(WORD_LENGTH):
+            for code in np.unique(letters[:, idx]).tolist():
+                self.at_position[idx, chr(code)] = self.words.from_mask(letters[:, idx] == code)
+
+        self.at_least = {}
+        for code in np.unique(letters).tolist():
+            counts = (letters == code).sum(axis=1)
+            for count in range(1, counts.max() + 1):
+                self.at_least[chr(code), count] = self.words.from_mask(counts >= count)
+
+    def legal_guesses(self, greens, minimum_counts):
+        # Rarest lists first, so the intersection shrinks as quickly as possible
+        postings = [self.at_position.get(rule) for rule in greens.items()]
+        postings += [self.at_least.get(rule) for rule in minimum_counts.items()]
+        if None in postings:
+            # some rule no word in the dictionary can meet
+            return self.words.from_mask(np.zeros(len(self.words), dtype=bool))
+
+        legal = self.words.everything()
+        for posting in sorted(postings, key=len):
+            legal &= posting
+        return legal
+
+    def legal_after(self, guesses, actual):
+        # Hard-mode legal guesses, after playing guesses toward the answer actual
+        patterns = [feedback_pattern(guess, actual) for guess in guesses]
+        return self.legal_guesses(*hard_mode_rules(guesses, patterns))
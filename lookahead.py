@@ -0,0 +1,171 @@
+import math
+
+import numpy as np
+
+from cache import BoundedCache
+from patterns import ALL_GREEN, bucket_histograms
+
+
+# How many of the best one-step guesses get searched further, at each step
+BRANCHING = 8
+
+# Sets of answers this small get solved exactly: every guess that splits them differently is
+# searched, all the way to the end of the game
+EXACT_UP_TO = 8
+
+# Solved sets of remaining answers, shared by every game
+TABLE_MAX_ENTRIES = 200_000
+
+# When the search stops, guess that each guess splits the remaining answers about this many ways.
+# Roughly fits how many guesses a strong solver needs for the full answer list.
+ESTIMATE_BRANCHING = 24
+
+# Expected guesses closer than this count as a tie
+TIE_TOLERANCE = 1e-9
+
+
+def estimated_guesses(num_answers):
+    # Expected guesses to find the answer, without searching. With n answers, one guess can at best
+    # be right 1/n of the time, and needs at least a second guess otherwise.
+    if num_answers <= 1:
+        return num_answers
+    return max(
+        (2 * num_answers - 1) / num_answers,
+        1 + math.log(num_answers, ESTIMATE_BRANCHING),
+    )
+
+
+class LookaheadSolver:
+    # Picks guesses that minimize the expected number of guesses to finish the game, looking depth
+    # guesses ahead. Past that, the remaining guesses are estimated from the number of answers.
+    #
+    # Results are kept in a transposition table keyed by the remaining answers (as a WordSet), since
+    # lots of different guesses lead to the same remaining answers.
+
+    def __init__(
+        self,
+        matrix,
+        all_guesses,
+        consider_all_words_maximum,
+        depth=2,
+        exact_up_to=EXACT_UP_TO,
+    ):
+        self.matrix = matrix
+        self.all_guesses = sorted(all_guesses)
+        self.all_guess_indices = matrix.guess_indices(self.all_guesses)
+        self.consider_all_words_maximum = consider_all_words_maximum
+        self.depth = depth
+        self.exact_up_to = exact_up_to
+        self.table = BoundedCache(max_entries=TABLE_MAX_ENTRIES)
+
+    def guess_pool(self, remaining):
+        # Same as the one-step heuristic: hard mode until there are few enough answers left.
+        # Returns the guesses, and their indices in the matrix.
+        if len(remaining) > self.consider_all_words_maximum:
+            pool = sorted(remaining)
+            return pool, self.matrix.guess_indices(pool)
+        else:
+            return self.all_guesses, self.all_guess_indices
+
+    def split(self, answer_indices, row):
+        # Splits the answers by the pattern they'd show, for one guess. Returns a lower bound on
+        # the total guesses still needed after it, summed over the answers, and the buckets of more
+        # than two answers (as WordSets), biggest first.
+        #
+        # Every answer but the guess itself needs at least one more guess, and all but one per
+        # bucket need two. For buckets of one or two answers, that's exactly what they need.
+        patterns, counts = np.unique(row, return_counts=True)
+        lower_total = 0
+        big_buckets = []
+        for pattern, count in zip(patterns.tolist(), counts.tolist()):
+            if pattern != ALL_GREEN:
+                lower_total += 2 * count - 1
+                if count > 2:
+                    mask = np.zeros(len(self.matrix.answers), dtype=bool)
+                    mask[answer_indices[row == pattern]] = True
+                    big_buckets.append((count, self.matrix.answers.from_mask(mask)))
+        big_buckets.sort(key=lambda bucket: -bucket[0])
+        return lower_total, big_buckets
+
+    def candidates(self, remaining, answer_indices, exact):
+        # Guesses worth searching, most promising (one step ahead) first, as (guess, patterns,
+        # lower bound on expected guesses). Guesses that split the answers identically would
+        # search identically, so only the first of each is kept.
+        num_answers = len(answer_indices)
+        pool, pool_indices = self.guess_pool(remaining)
+        self.matrix.compute_rows(pool_indices)
+        rows = np.ascontiguousarray(self.matrix.patterns[np.ix_(pool_indices, answer_indices)])
+        # pool is sorted, so each kept guess is the first alphabetically with its split
+        _, first = np.unique(rows.view(np.dtype((np.void, num_answers))).ravel(), return_index=True)
+        rows = rows[first]
+
+        histograms = bucket_histograms(rows)
+        num_green = histograms[:, ALL_GREEN].copy()
+        histograms[:, ALL_GREEN] = 0
+        scores = (histograms * histograms).sum(axis=1) / num_answers
+        num_buckets = np.count_nonzero(histograms, axis=1)
+        lower_bounds = 1 + (2 * (num_answers - num_green) - num_buckets) / num_answers
+
+        # guesses that can't tell any answers apart would never finish
+        order = np.lexsort((first, scores))
+        order = order[scores[order] < num_answers]
+        if not exact:
+            order = order[:BRANCHING]
+        lower_bounds = lower_bounds.tolist()
+        return [(pool[first[idx]], rows[idx], lower_bounds[idx]) for idx in order.tolist()]
+
+    def solve(self, remaining, depth=None):
+        # Returns (expected guesses to finish, best guess). The guess is None when the search
+        # ran out of depth, and the expected guesses are only an estimate.
+        if depth is None:
+            depth = self.depth
+        num_answers = len(remaining)
+        if num_answers <= 2:
+            return (estimated_guesses(num_answers), min(remaining, default=None))
+
+        exact = num_answers <= self.exact_up_to
+        if not exact and depth <= 0:
+            return (estimated_guesses(num_answers), None)
+
+        key = (remaining, None if exact else depth)
+        solution = self.table.get(key)
+        if solution is None:
+            solution = self.search(remaining, depth, exact)
+            self.table.put(key, solution)
+        return solution
+
+    def search(self, remaining, depth, exact):
+        answer_indices = self.matrix.answers.indices(remaining)
+        num_answers = len(answer_indices)
+        best = (math.inf, None)
+        for guess, row, lower_bound in self.candidates(remaining, answer_indices, exact):
+            # On a tie, a guess that might be the answer is better: it could win right away
+            can_tie = guess in remaining and best[1] not in remaining
+            limit = best[0] + TIE_TOLERANCE if can_tie else best[0] - TIE_TOLERANCE
+            if lower_bound >= limit:
+                continue
+
+            # Tighten the bound one bucket at a time, and stop as soon as it can't beat the best
+            # guess so far
+            lower_total, big_buckets = self.split(answer_indices, row)
+            bound = 1 + lower_total / num_answers
+            for count, bucket in big_buckets:
+                if bound >= limit:
+                    break
+                sub_guesses, _ = self.solve(bucket, depth - 1)
+                bound += (count * sub_guesses - (2 * count - 1)) / num_answers
+            else:
+                if bound < limit:
+                    best = (bound, guess)
+        return best
+
+    def guess_cost(self, remaining, guess, depth=None):
+        # Expected guesses to finish, if guess is the next one
+        if depth is None:
+            depth = self.depth
+        answer_indices = self.matrix.answers.indices(remaining)
+        row = self.matrix.row(guess)[answer_indices]
+        total, big_buckets = self.split(answer_indices, row)
+        for count, bucket in big_buckets:
+            total += count * self.solve(bucket, depth - 1)[0] - (2 * count - 1)
+        return 1 + total / len(answer_indices)
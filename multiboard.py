@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class BoardScores:
+    # Expected remaining words for every guess in the pattern matrix, against one board's
+    # remaining answers. Scores are only calculated the first time a guess is asked about.
+
+    def __init__(self, matrix, remaining, score):
+        self.matrix = matrix
+        self.remaining = remaining
+        self.score = score
+        self.scores = np.full(len(matrix.guess_words), np.nan)
+
+    def get(self, guess_indices):
+        missing = guess_indices[np.isnan(self.scores[guess_indices])]
+        if len(missing):
+            missing = np.unique(missing)
+            missing_guesses = [self.matrix.guess_words[idx] for idx in missing]
+            scores = self.score(self.remaining, missing_guesses)
+            self.scores[missing] = scores.expected_remaining
+        return self.scores[guess_indices]
+
+
+class MultiBoardScorer:
+    # Sums the expected remaining words of each guess across all boards. Boards are keyed by their
+    # remaining WordSet, so a board that didn't change since the last round, or that has the same
+    # words left as another board, reuses the scores it already has.
+    #
+    # score(remaining, guesses) returns the GuessScores of the guesses against a board. By default
+    # that's the matrix itself, in this process.
+
+    def __init__(self, matrix, score=None):
+        self.matrix = matrix
+        self.score = self.score_in_process if score is None else score
+        self.boards = {}
+
+    def score_in_process(self, remaining, guesses):
+        return self.matrix.score(guesses, self.matrix.answers.indices(remaining))
+
+    def board(self, remaining):
+        if remaining not in self.boards:
+            self.boards[remaining] = BoardScores(self.matrix, remaining, self.score)
+        return self.boards[remaining]
+
+    def total_scores(self, remainings, guesses):
+        guess_indices = self.matrix.guess_indices(guesses)
+        totals = np.zeros(len(guess_indices))
+        for remaining in remainings:
+            # solved boards can't have any words left
+            if remaining:
+                totals += self.board(remaining).get(guess_indices)
+
+        # Forget boards that have moved on, so the cache doesn't grow every round
+        live_boards = {remaining for remaining in remainings if remaining}
+        self.boards = {
+            remaining: scores
+            for remaining, scores in self.boards.items()
+            if remaining in live_boards
+        }
+        return totals
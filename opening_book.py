@@ -0,0 +1,129 @@
+from collections import namedtuple
+import os
+import sqlite3
+
+
+BOOK_PATH = 'opening_book.sqlite'
+
+# Bump when the tables change shape, or what goes in them changes meaning
+BOOK_VERSION = 2
+
+# The best, worst (both picked from the remaining words), easy-mode best (picked from the full
+# dictionary) and hard-mode best (picked from every guess hard mode allows) guesses for some
+# remaining set of answers. The easy-mode fields are None when there are too many words left to
+# consider easy mode. The hard-mode fields are None if the hard-mode guesses weren't known.
+GuessRange = namedtuple('GuessRange', [
+    'best_score',
+    'best_guess',
+    'worst_score',
+    'worst_guess',
+    'easy_best_score',
+    'easy_best_guess',
+    'hard_best_score',
+    'hard_best_guess',
+])
+
+SCHEMA = """
+    CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    CREATE TABLE openers (
+        guess TEXT PRIMARY KEY,
+        score REAL NOT NULL,
+        is_candidate INTEGER NOT NULL
+    );
+    CREATE TABLE follow_ups (
+        opener TEXT NOT NULL,
+        pattern INTEGER NOT NULL,
+        best_score REAL NOT NULL,
+        best_guess TEXT NOT NULL,
+        worst_score REAL NOT NULL,
+        worst_guess TEXT NOT NULL,
+        easy_best_score REAL,
+        easy_best_guess TEXT,
+        hard_best_score REAL,
+        hard_best_guess TEXT,
+        PRIMARY KEY (opener, pattern)
+    );
+"""
+
+
+class OpeningBook:
+    # Read-only view of a book written by write_book(). Nothing is read from disk until the first
+    # lookup.
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+        return self.connection
+
+    def is_current(self):
+        # A book built for different word lists (or settings) is useless, so treat it as missing
+        if not os.path.exists(self.path):
+            return False
+        try:
+            meta = dict(self.connect().execute("SELECT key, value FROM meta"))
+        except sqlite3.DatabaseError:
+            return False
+        return meta.get('version') == str(BOOK_VERSION) and meta.get('key') == self.key
+
+    def opener_score(self, guess):
+        row = self.connect().execute(
+            "SELECT score FROM openers WHERE guess = ?", (guess,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def opener_range(self):
+        # Ties are broken the same way as min() and max() on (score, guess) tuples. Hard mode
+        # allows any opener at all.
+        best = self.connect().execute(
+            "SELECT score, guess FROM openers WHERE is_candidate ORDER BY score, guess LIMIT 1"
+        ).fetchone()
+        worst = self.connect().execute(
+            "SELECT score, guess FROM openers WHERE is_candidate"
+            " ORDER BY score DESC, guess DESC LIMIT 1"
+        ).fetchone()
+        hard_best = self.connect().execute(
+            "SELECT score, guess FROM openers ORDER BY score, guess LIMIT 1"
+        ).fetchone()
+        if best is None:
+            return None
+        else:
+            return GuessRange(*best, *worst, None, None, *hard_best)
+
+    def follow_up(self, opener, pattern):
+        row = self.connect().execute(
+            "SELECT best_score, best_guess, worst_score, worst_guess, easy_best_score,"
+            " easy_best_guess, hard_best_score, hard_best_guess"
+            " FROM follow_ups WHERE opener = ? AND pattern = ?",
+            (opener, pattern),
+        ).fetchone()
+        return None if row is None else GuessRange(*row)
+
+
+def write_book(path, key, opener_scores, follow_ups):
+    # opener_scores is an iterable of (guess, score, is_candidate)
+    # follow_ups is an iterable of (opener, pattern, GuessRange)
+    building_path = path + '.building'
+    if os.path.exists(building_path):
+        os.remove(building_path)
+
+    connection = sqlite3.connect(building_path)
+    with connection:
+        connection.executescript(SCHEMA)
+        connection.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [('version', str(BOOK_VERSION)), ('key', key)],
+        )
+        connection.executemany("INSERT INTO openers VALUES (?, ?, ?)", opener_scores)
+        connection.executemany(
+            "INSERT INTO follow_ups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((opener, pattern, *guess_range) for opener, pattern, guess_range in follow_ups),
+        )
+    connection.close()
+
+    # Swap in the finished book all at once, so readers never see half of one
+    os.replace(building_path, path)
@@ -0,0 +1,148 @@
+import atexit
+from multiprocessing import Pool
+import os
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from patterns import (
+    GuessScores,
+    ROW_CHUNK_SIZE,
+    WORD_LENGTH,
+    compute_encoded_patterns,
+    encode_words,
+    score_pattern_rows,
+)
+
+
+# Below this many (guess, answer) pairs, it's faster to skip the pool and score in-process
+PARALLEL_MINIMUM_PAIRS = 500_000
+
+# Set up in each worker process by attach_worker()
+WORKER_ARRAYS = {}
+
+
+def usable_workers(workers):
+    # Oversubscribing the CPUs this process can run on only adds IPC overhead
+    if hasattr(os, 'sched_getaffinity'):
+        num_cpus = len(os.sched_getaffinity(0))
+    else:
+        num_cpus = os.cpu_count() or 1
+    return min(workers, num_cpus)
+
+
+def shared_array(shape, dtype):
+    memory = SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def attach_worker(layouts):
+    # Keep a reference to each SharedMemory, or the buffer under the array gets closed
+    for name, (memory_name, shape, dtype) in layouts.items():
+        memory = SharedMemory(name=memory_name)
+        WORKER_ARRAYS[name] = (memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+
+
+def compute_chunk(task):
+    start, stop = task
+    patterns = WORKER_ARRAYS['patterns'][1]
+    guess_indices = WORKER_ARRAYS['guesses'][1][start:stop]
+    guess_letters = WORKER_ARRAYS['guess_letters'][1][guess_indices]
+    answer_letters = WORKER_ARRAYS['answer_letters'][1]
+    patterns[guess_indices] = compute_encoded_patterns(guess_letters, answer_letters)
+
+
+def score_chunk(task):
+    start, stop, num_answers = task
+    patterns = WORKER_ARRAYS['patterns'][1]
+    guess_indices = WORKER_ARRAYS['guesses'][1][start:stop]
+    answer_indices = WORKER_ARRAYS['answers'][1][:num_answers]
+    scores = score_pattern_rows(patterns[guess_indices][:, answer_indices])
+
+    results = WORKER_ARRAYS['results'][1]
+    results[0, start:stop] = scores.expected_remaining
+    results[1, start:stop] = scores.max_remaining
+    results[2, start:stop] = scores.entropy
+
+
+class ParallelScorer:
+    # Scores guesses against a PatternMatrix on a pool of worker processes. The word lists, the
+    # matrix, and the guess/answer indices of each request live in shared memory. So the only
+    # things sent to a worker per task are a few ints. Workers fill in missing matrix rows and write
+    # their scores straight back into shared memory.
+
+    def __init__(self, matrix, workers):
+        self.matrix = matrix
+        self.memories = []
+        self.layouts = {}
+
+        # Move the matrix itself into shared memory. Rows that get computed later still show up in
+        # the workers, because they are written into the same buffer.
+        patterns = self.allocate('patterns', matrix.patterns.shape, np.uint8)
+        patterns[:] = matrix.patterns
+        matrix.patterns = patterns
+
+        num_guesses, num_answers = patterns.shape
+        guess_letters = self.allocate('guess_letters', (num_guesses, WORD_LENGTH), np.uint8)
+        guess_letters[:] = encode_words(matrix.guess_words)
+        answer_letters = self.allocate('answer_letters', (num_answers, WORD_LENGTH), np.uint8)
+        answer_letters[:] = encode_words(matrix.answers.words)
+        self.guesses = self.allocate('guesses', (num_guesses,), np.intp)
+        self.answers = self.allocate('answers', (num_answers,), np.intp)
+        self.results = self.allocate('results', (3, num_guesses), np.float64)
+
+        self.pool = Pool(workers, initializer=attach_worker, initargs=(self.layouts,))
+        atexit.register(self.close)
+
+    def allocate(self, name, shape, dtype):
+        memory, array = shared_array(shape, dtype)
+        self.memories.append(memory)
+        self.layouts[name] = (memory.name, shape, dtype)
+        return array
+
+    def score(self, guesses, answer_indices):
+        guesses = list(guesses)
+        num_pairs = len(guesses) * len(answer_indices)
+        all_in_matrix = all(guess in self.matrix.guess_index for guess in guesses)
+        if num_pairs < PARALLEL_MINIMUM_PAIRS or not all_in_matrix:
+            return self.matrix.score(guesses, answer_indices)
+
+        guess_indices = self.matrix.guess_indices(guesses)
+        self.compute_rows(guess_indices)
+
+        num_guesses = len(guess_indices)
+        num_answers = len(answer_indices)
+        self.guesses[:num_guesses] = guess_indices
+        self.answers[:num_answers] = answer_indices
+        tasks = [
+            (start, min(start + ROW_CHUNK_SIZE, num_guesses), num_answers)
+            for start in range(0, num_guesses, ROW_CHUNK_SIZE)
+        ]
+        self.pool.map(score_chunk, tasks)
+
+        results = self.results[:, :num_guesses]
+        return GuessScores(results[0].copy(), results[1].astype(int), results[2].copy())
+
+    def compute_rows(self, guess_indices):
+        missing = np.unique(guess_indices[~self.matrix.is_computed[guess_indices]])
+        self.guesses[:len(missing)] = missing
+        tasks = [
+            (start, min(start + ROW_CHUNK_SIZE, len(missing)))
+            for start in range(0, len(missing), ROW_CHUNK_SIZE)
+        ]
+        self.pool.map(compute_chunk, tasks)
+        self.matrix.is_computed[missing] = True
+
+    def close(self):
+        if self.pool is None:
+            return
+        self.pool.terminate()
+        self.pool = None
+
+        # Give the matrix its own memory back, before the shared buffer goes away
+        self.matrix.patterns = np.array(self.matrix.patterns)
+        self.guesses = self.answers = self.results = None
+        for memory in self.memories:
+            memory.close()
+            memory.unlink()
+        self.memories = []
@@ -0,0 +1,295 @@
+from collections import namedtuple
+from functools import lru_cache
+import hashlib
+
+import numpy as np
+
+from bitset import WordIndex
+from wordlists import valid, likely
+
+
+WORD_LENGTH = 5
+
+# A pattern packs the colors of a guess into one base-3 number, with the first letter as the most
+# significant digit. 0 is gray, 1 is yellow, 2 is green. So 'nnygn' (in the notes in analysis.py)
+# is 0*81 + 0*27 + 1*9 + 2*3 + 0 = 15.
+GRAY, YELLOW, GREEN = 0, 1, 2
+NUM_PATTERNS = 3 ** WORD_LENGTH
+ALL_GREEN = NUM_PATTERNS - 1
+
+# The pattern matrix is only for 5-letter words, but the functions below work on any length, as
+# long as every word in one call is the same length (see tiled.py)
+
+# How many guesses to run through numpy at once, to keep the intermediate arrays small
+ROW_CHUNK_SIZE = 256
+
+# When pruning, answers are added to the bucket counts in this many blocks, checking the bound on
+# each guess's score after every block
+PRUNING_BLOCKS = 8
+
+# Scores for many guesses at once, each field is an array with one entry per guess:
+#   - expected_remaining: average number of words left after the guess
+#   - max_remaining: words left in the worst case
+#   - entropy: expected information from the colors, in bits
+GuessScores = namedtuple('GuessScores', ['expected_remaining', 'max_remaining', 'entropy'])
+
+
+def feedback_pattern(guess, answer):
+    colors = [GRAY] * len(guess)
+    unmatched = []
+    for idx, (guess_letter, answer_letter) in enumerate(zip(guess, answer)):
+        if guess_letter == answer_letter:
+            colors[idx] = GREEN
+        else:
+            unmatched.append(answer_letter)
+
+    for idx, letter in enumerate(guess):
+        if colors[idx] != GREEN and letter in unmatched:
+            colors[idx] = YELLOW
+            unmatched.remove(letter)
+
+    pattern = 0
+    for color in colors:
+        pattern = pattern * 3 + color
+    return pattern
+
+
+# Colors typed as letters, like the notes in analysis.py: n is gray, y is yellow, g is green
+COLOR_LETTERS = 'nyg'
+
+
+def parse_pattern(text):
+    # 'nnygn' -> 15
+    text = text.strip().lower()
+    if len(text) != WORD_LENGTH or any(letter not in COLOR_LETTERS for letter in text):
+        raise ValueError(
+            f"Colors must be {WORD_LENGTH} of n (gray), y (yellow) or g (green), like nnygn,"
+            f" got {text!r}"
+        )
+    pattern = 0
+    for letter in text:
+        pattern = pattern * 3 + COLOR_LETTERS.index(letter)
+    return pattern
+
+
+def format_pattern(pattern):
+    # 15 -> 'nnygn'
+    letters = []
+    for _ in range(WORD_LENGTH):
+        pattern, color = divmod(pattern, 3)
+        letters.append(COLOR_LETTERS[color])
+    return ''.join(reversed(letters))
+
+
+def pattern_dtype(word_length):
+    # Smallest unsigned type that fits every pattern for this word length
+    num_patterns = 3 ** word_length
+    if num_patterns <= 2 ** 8:
+        return np.uint8
+    elif num_patterns <= 2 ** 16:
+        return np.uint16
+    elif num_patterns <= 2 ** 32:
+        return np.uint32
+    else:
+        raise ValueError(f"Words of {word_length} letters have too many patterns to store")
+
+
+def encode_words(words, word_length=WORD_LENGTH):
+    joined = ''.join(words).encode('ascii')
+    if words:
+        word_length = len(words[0])
+    return np.frombuffer(joined, dtype=np.uint8).reshape(len(words), word_length)
+
+
+def compute_patterns(guesses, answers):
+    # Vectorized version of feedback_pattern(), for every guess against every answer
+    return compute_encoded_patterns(encode_words(guesses), encode_words(answers))
+
+
+def compute_encoded_patterns(guess_letters, answer_letters):
+    word_length = guess_letters.shape[1]
+    dtype = pattern_dtype(word_length)
+    greens = [
+        guess_letters[:, idx, None] == answer_letters[None, :, idx]
+        for idx in range(word_length)
+    ]
+    not_greens = [~green for green in greens]
+    patterns = np.zeros((len(guess_letters), len(answer_letters)), dtype=dtype)
+
+    for idx in range(word_length):
+        letter = guess_letters[:, idx, None]
+        # how many times the letter shows up in the answer, outside of green positions...
+        available = np.zeros(patterns.shape, dtype=np.int8)
+        for answer_idx in range(word_length):
+            available += (answer_letters[None, :, answer_idx] == letter) & not_greens[answer_idx]
+        # ...minus the earlier non-green copies of the letter in the guess, which take yellows first
+        for earlier_idx in range(idx):
+            available -= (guess_letters[:, earlier_idx, None] == letter) & not_greens[earlier_idx]
+        yellows = not_greens[idx] & (available > 0)
+
+        colors = np.where(greens[idx], dtype(GREEN), yellows.astype(dtype))
+        patterns += colors * dtype(3 ** (word_length - 1 - idx))
+
+    return patterns
+
+
+def word_lists_fingerprint(guess_words, answer_words):
+    # Identifies a pair of word lists, so files computed from them can be checked before use
+    digest = hashlib.sha256()
+    for words in (guess_words, answer_words):
+        digest.update(' '.join(words).encode('ascii'))
+        digest.update(b'\n')
+    return digest.hexdigest()[:16]
+
+
+class PatternMatrix:
+    # Holds the feedback pattern of every guess against every answer, as a uint8 matrix. Rows are
+    # computed lazily, the first time each guess is needed.
+
+    def __init__(self, guess_words, answer_words):
+        self.guess_words = list(guess_words)
+        self.guess_index = {word: idx for idx, word in enumerate(self.guess_words)}
+        self.answers = WordIndex(answer_words)
+        self.patterns = np.zeros((len(self.guess_words), len(self.answers)), dtype=np.uint8)
+        self.is_computed = np.zeros(len(self.guess_words), dtype=bool)
+
+    def fingerprint(self):
+        # Identifies the word lists, for anything precomputed from this matrix and saved to disk
+        return word_lists_fingerprint(self.guess_words, self.answers.words)
+
+    def guess_indices(self, guesses):
+        return np.fromiter((self.guess_index[guess] for guess in guesses), dtype=np.intp)
+
+    def compute_rows(self, guess_indices):
+        missing = np.unique(guess_indices[~self.is_computed[guess_indices]])
+        for start in range(0, len(missing), ROW_CHUNK_SIZE):
+            chunk = missing[start:start + ROW_CHUNK_SIZE]
+            chunk_words = [self.guess_words[idx] for idx in chunk]
+            self.patterns[chunk] = compute_patterns(chunk_words, self.answers.words)
+            self.is_computed[chunk] = True
+
+    def rows(self, guesses):
+        # Patterns of each guess against every answer. Guesses outside the dictionary get
+        # calculated on the fly, and aren't saved.
+        guesses = list(guesses)
+        if all(guess in self.guess_index for guess in guesses):
+            guess_indices = self.guess_indices(guesses)
+            self.compute_rows(guess_indices)
+            return self.patterns[guess_indices]
+        else:
+            return compute_patterns(guesses, self.answers.words)
+
+    def row(self, guess):
+        return self.rows([guess])[0]
+
+    def matching(self, guess, pattern):
+        # All answers that would show this pattern when guessing guess, as a WordSet
+        return self.answers.from_mask(self.row(guess) == pattern)
+
+    def score(self, guesses, answer_indices):
+        guesses = list(guesses)
+        chunk_scores = [
+            score_pattern_rows(self.rows(guesses[start:start + ROW_CHUNK_SIZE])[:, answer_indices])
+            for start in range(0, len(guesses), ROW_CHUNK_SIZE)
+        ]
+        if chunk_scores:
+            return GuessScores(*(np.concatenate(field) for field in zip(*chunk_scores)))
+        else:
+            return score_pattern_rows(np.zeros((0, len(answer_indices)), dtype=np.uint8))
+
+    def extreme_guess(self, guesses, answer_indices, worst=False):
+        # Find the (score, guess) with the lowest expected remaining words (or the highest, if
+        # worst), with ties broken the same way as min()/max() on the tuples. Guesses should be
+        # sorted so that the most promising come first.
+        #
+        # Answers get added to each guess's buckets a block at a time. As soon as a bound on a
+        # guess's final sum of squared bucket sizes can't beat the best one so far, the guess is
+        # dropped without looking at the rest of the answers.
+        guesses = list(guesses)
+        pick = max if worst else min
+        num_answers = len(answer_indices)
+        if num_answers == 0:
+            return (0, pick(guesses))
+
+        answer_blocks = np.array_split(answer_indices, min(PRUNING_BLOCKS, num_answers))
+        found = None
+
+        for start in range(0, len(guesses), ROW_CHUNK_SIZE):
+            chunk = guesses[start:start + ROW_CHUNK_SIZE]
+            rows = self.rows(chunk)
+            alive = np.arange(len(chunk))
+            histograms = np.zeros((len(chunk), NUM_PATTERNS), dtype=np.int64)
+            num_seen = 0
+
+            for block in answer_blocks:
+                histograms[alive] += bucket_histograms(rows[np.ix_(alive, block)])
+                num_seen += len(block)
+                if found is None or num_seen == num_answers:
+                    continue
+
+                alive_histograms = histograms[alive].copy()
+                alive_histograms[:, ALL_GREEN] = 0
+                partial_total = (alive_histograms * alive_histograms).sum(axis=1)
+                num_unseen = num_answers - num_seen
+                if worst:
+                    # at most, every unseen answer lands in the biggest bucket
+                    largest = alive_histograms.max(axis=1)
+                    bound = partial_total + 2 * num_unseen * largest + num_unseen ** 2
+                    alive = alive[bound >= found[0]]
+                else:
+                    # at least, every unseen answer but the guess itself adds one
+                    bound = partial_total + num_unseen - 1
+                    alive = alive[bound <= found[0]]
+
+                if len(alive) == 0:
+                    break
+
+            histograms = histograms[alive]
+            histograms[:, ALL_GREEN] = 0
+            totals = (histograms * histograms).sum(axis=1)
+            candidates = [(total, chunk[idx]) for total, idx in zip(totals.tolist(), alive)]
+            if found is not None:
+                candidates.append(found)
+            if candidates:
+                found = pick(candidates)
+
+        total, guess = found
+        return (total / num_answers, guess)
+
+
+@lru_cache(maxsize=1)
+def default_matrix():
+    return PatternMatrix(sorted(valid), sorted(likely))
+
+
+def bucket_histograms(pattern_rows, num_patterns=NUM_PATTERNS):
+    # Count how many answers land in each pattern, for every row at once. Each row gets shifted
+    # into its own range of num_patterns bins, so a single bincount can do the whole batch.
+    num_rows = len(pattern_rows)
+    offsets = np.arange(num_rows, dtype=np.intp)[:, None] * num_patterns
+    counts = np.bincount((pattern_rows + offsets).ravel(), minlength=num_rows * num_patterns)
+    return counts.reshape(num_rows, num_patterns)
+
+
+def score_pattern_rows(pattern_rows, num_patterns=NUM_PATTERNS):
+    num_guesses, num_answers = pattern_rows.shape
+    if num_answers == 0:
+        return GuessScores(
+            np.zeros(num_guesses),
+            np.zeros(num_guesses, dtype=int),
+            np.zeros(num_guesses),
+        )
+
+    sizes = bucket_histograms(pattern_rows, num_patterns)
+
+    probabilities = sizes / num_answers
+    log_probabilities = np.log2(probabilities, where=sizes > 0, out=np.zeros(sizes.shape))
+    entropy = -(probabilities * log_probabilities).sum(axis=1)
+
+    # The answer lands in each bucket with probability size/n, and then leaves size words.
+    # A correct guess leaves 0 words, so the all-green bucket doesn't count.
+    sizes[:, num_patterns - 1] = 0
+    expected_remaining = (sizes * sizes).sum(axis=1) / num_answers
+    max_remaining = sizes.max(axis=1)
+
+    return GuessScores(expected_remaining, max_remaining, entropy)
@@ -0,0 +1,123 @@
+from collections import Counter, defaultdict
+import json
+import os
+import signal
+import sys
+import time
+
+
+# Set either of these in the environment to turn on profiling, same as --profile and
+# --profile-interval
+PROFILE_ENV = 'WORDLE_PROFILE'
+PROFILE_INTERVAL_ENV = 'WORDLE_PROFILE_INTERVAL'
+
+# How many of the most sampled functions to list in the summary
+TOP_SAMPLED = 25
+
+
+class StackSampler:
+    # A bare-bones sampling profiler: every interval seconds of CPU time, note which function is
+    # running, and which function called it. Much cheaper than cProfile on hot loops, because
+    # nothing happens between samples. Needs SIGPROF, so it's Unix only, and only samples the
+    # main thread.
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = Counter()
+        self.callers = Counter()
+        self.num_samples = 0
+
+    def start(self):
+        signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def sample(self, signum, frame):
+        if frame is None:
+            return
+        self.num_samples += 1
+        location = frame_location(frame)
+        self.samples[location] += 1
+        if frame.f_back is not None:
+            self.callers[f"{frame_location(frame.f_back)} -> {location}"] += 1
+
+    def summary(self):
+        def shares(counter):
+            return [
+                {'function': location, 'samples': count, 'share': count / self.num_samples}
+                for location, count in counter.most_common(TOP_SAMPLED)
+            ]
+
+        return {
+            'interval_seconds': self.interval,
+            'samples': self.num_samples,
+            'functions': shares(self.samples),
+            'calls': shares(self.callers),
+        }
+
+
+def frame_location(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class Profiler:
+    # Counters, peaks and timings from the hot paths of the analysis, collected while a run goes,
+    # then written out as one JSON summary. Compare summaries across runs to catch regressions.
+    #
+    # Counts and peaks are only from this process: the process pools used by --workers and batch
+    # don't report back.
+
+    def __init__(self, sample_interval=None):
+        self.started = time.perf_counter()
+        self.calls = Counter()
+        self.peaks = {}
+        self.rounds = defaultdict(list)
+        self.sampler = None if not sample_interval else StackSampler(sample_interval)
+        if self.sampler is not None:
+            self.sampler.start()
+
+    def call(self, name, size=None):
+        # Count a call, and the largest set it was given
+        self.calls[name] += 1
+        if size is not None:
+            self.peak(name, size)
+
+    def peak(self, name, size):
+        if size > self.peaks.get(name, -1):
+            self.peaks[name] = size
+
+    def record_round(self, name, label, seconds, num_remaining):
+        # One round (like one guess) of name. Rounds that yield their results include the time
+        # the consumer takes, which is negligible when it's just printing.
+        self.rounds[name].append({'round': label, 'seconds': seconds, 'remaining': num_remaining})
+
+    def summary(self, caches):
+        summary = {
+            'argv': sys.argv,
+            'finished_at': time.time(),
+            'seconds': time.perf_counter() - self.started,
+            'calls': dict(sorted(self.calls.items())),
+            'peak_sizes': dict(sorted(self.peaks.items())),
+            'rounds': {
+                name: {'seconds': sum(r['seconds'] for r in rounds), 'each': rounds}
+                for name, rounds in self.rounds.items()
+            },
+            'caches': caches,
+        }
+        if self.sampler is not None:
+            self.sampler.stop()
+            summary['sampled'] = self.sampler.summary()
+        return summary
+
+    def write_summary(self, path, caches):
+        # path '-' means stderr, so it doesn't mix with the analysis on stdout
+        text = json.dumps(self.summary(caches), indent=2)
+        if path == '-':
+            print(text, file=sys.stderr)
+        else:
+            with open(path, 'w') as f:
+                f.write(text + '\n')
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from patterns import GuessScores
+
+
+SCORE_CACHE_PATH = 'score_cache.sqlite'
+SCORE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump when the scores change meaning, so old entries stop matching
+SCORE_VERSION = 1
+
+# How long to wait on another process that's writing to the cache, in seconds
+BUSY_TIMEOUT = 10
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS scores (
+        key TEXT PRIMARY KEY,
+        expected_remaining BLOB NOT NULL,
+        max_remaining BLOB NOT NULL,
+        entropy BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        last_used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS scores_by_last_used ON scores (last_used);
+"""
+
+
+def score_key(word_list_version, answer_indices, sorted_guesses):
+    # Content-addressed: the same answers and guesses, with the same word lists, always get the
+    # same key, whichever process or game they came from
+    digest = hashlib.sha256()
+    digest.update(f"{word_list_version}:{SCORE_VERSION}\n".encode('ascii'))
+    digest.update(np.asarray(answer_indices, dtype='<u4').tobytes())
+    digest.update('\n'.join(sorted_guesses).encode('ascii'))
+    return digest.hexdigest()
+
+
+class ScoreCache:
+    # Guess scores saved in SQLite, so separate runs (and separate processes at the same time) can
+    # share them. Least recently used entries get evicted past max_bytes. Any database trouble just
+    # means a cache miss, never a failed analysis.
+
+    def __init__(self, path=SCORE_CACHE_PATH, max_bytes=SCORE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection = None
+        self.connection_pid = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def connect(self):
+        # A connection can't be shared with a forked process, so each process opens its own
+        if self.connection is None or self.connection_pid != os.getpid():
+            self.connection = sqlite3.connect(
+                self.path,
+                timeout=BUSY_TIMEOUT,
+                isolation_level=None,
+            )
+            self.connection_pid = os.getpid()
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(SCHEMA)
+        return self.connection
+
+    def get(self, key):
+        try:
+            connection = self.connect()
+            row = connection.execute(
+                "SELECT expected_remaining, max_remaining, entropy FROM scores WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE scores SET last_used = ? WHERE key = ?", (time.time(), key)
+                )
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+
+        if row is None:
+            self.misses += 1
+            return None
+        else:
+            self.hits += 1
+            expected_remaining, max_remaining, entropy = row
+            return GuessScores(
+                np.frombuffer(expected_remaining, dtype='<f8'),
+                np.frombuffer(max_remaining, dtype='<i8'),
+                np.frombuffer(entropy, dtype='<f8'),
+            )
+
+    def put(self, key, scores):
+        blobs = (
+            scores.expected_remaining.astype('<f8').tobytes(),
+            scores.max_remaining.astype('<i8').tobytes(),
+            scores.entropy.astype('<f8').tobytes(),
+        )
+        size = sum(len(blob) for blob in blobs)
+        try:
+            connection = self.connect()
+            # IMMEDIATE takes the write lock up front, so the eviction below sees a stable total
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, *blobs, size, time.time()),
+                )
+                self.evict(connection)
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            self.errors += 1
+
+    def evict(self, connection):
+        total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM scores").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+
+        evicted = []
+        for key, size in connection.execute("SELECT key, size FROM scores ORDER BY last_used"):
+            if total_size <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total_size -= size
+        connection.executemany("DELETE FROM scores WHERE key = ?", evicted)
+
+    def scores(self, word_list_version, answer_indices, guesses, calculate):
+        # Scores for the guesses (in their given order), from the cache or else from
+        # calculate(guesses). Entries are stored in sorted guess order, so a set of guesses in
+        # any order finds the same entry.
+        order = sorted(range(len(guesses)), key=guesses.__getitem__)
+        sorted_guesses = [guesses[idx] for idx in order]
+        key = score_key(word_list_version, answer_indices, sorted_guesses)
+
+        sorted_scores = self.get(key)
+        if sorted_scores is None:
+            sorted_scores = calculate(sorted_guesses)
+            self.put(key, sorted_scores)
+
+        fields = []
+        for sorted_field in sorted_scores:
+            field = np.empty_like(sorted_field)
+            field[order] = sorted_field
+            fields.append(field)
+        return GuessScores(*fields)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
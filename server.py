@@ -0,0 +1,264 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import json
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from analysis import (
+    ai_guesses,
+    as_candidates,
+    get_remaining,
+    guess_range_for,
+    load_opening_book,
+    posthoc_analysis,
+    to_words,
+)
+from assist import HintTree
+import patterns
+from wordlists import likely
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Don't let a client send an endless request head
+MAX_HEADER_LINES = 100
+
+# Anything the client sends after the request is read in pieces this big, and ignored
+READ_SIZE = 4096
+
+STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+
+
+def query_words(query, name):
+    # Words can be given as "rales,bound,rainy", or as the same parameter repeated
+    raw = [word for value in query.get(name, []) for word in value.split(',') if word]
+    return to_words(raw)
+
+
+def query_answer(query):
+    answers = query_words(query, 'answer')
+    if len(answers) != 1:
+        raise ValueError("Give exactly one answer")
+    return answers[0]
+
+
+# Each request handler checks its parameters (raising ValueError if they're bad) and returns a
+# generator of JSON records. Records are only generated as the client is ready for them.
+
+def posthoc_request(query):
+    guesses = query_words(query, 'guesses')
+    if not guesses:
+        raise ValueError("No guesses in game")
+    budget_seconds = query.get('budget')
+    budget_seconds = None if budget_seconds is None else float(budget_seconds[-1])
+    lines = posthoc_analysis(guesses[-1], guesses, budget_seconds)
+    return ({'line': line} for line in lines)
+
+
+def ai_request(query):
+    actual = query_answer(query)
+    return (
+        {'guess': guess, 'expected_remaining': estimate, 'remaining': len(remaining)}
+        for guess, estimate, remaining in ai_guesses(actual)
+    )
+
+
+def best_request(query):
+    # The best and worst guesses, after the given guesses (if any) toward the answer
+    actual = query_answer(query)
+    guesses = query_words(query, 'guesses')
+
+    def records():
+        remaining = as_candidates(likely)
+        for guess in guesses:
+            remaining = get_remaining(remaining, actual, guess)
+        record = {'remaining': len(remaining)}
+        if len(remaining) > 1:
+            record.update(guess_range_for(guesses, actual, remaining)._asdict())
+        yield record
+
+    return records()
+
+
+@lru_cache(maxsize=1)
+def hint_tree():
+    return HintTree()
+
+
+def hint_request(query):
+    # The best next guess, from the guesses so far and the colors each one showed (like nnygn).
+    # No answer needed, so it works mid-game.
+    guesses = query_words(query, 'guesses')
+    colors = [value for values in query.get('colors', []) for value in values.split(',') if value]
+    if len(colors) != len(guesses):
+        raise ValueError("Give the colors for each guess")
+    hint = hint_tree().hint(guesses, [patterns.parse_pattern(value) for value in colors])
+    return iter([hint._asdict()])
+
+
+ROUTES = {
+    '/ph': posthoc_request,
+    '/ai': ai_request,
+    '/best': best_request,
+    '/hint': hint_request,
+}
+
+
+def warm_up():
+    load_opening_book()
+    matrix = patterns.default_matrix()
+    matrix.compute_rows(matrix.guess_indices(likely))
+    # every second guess, so most hints are ready before anyone asks
+    hint_tree().grow(depth=1)
+
+
+def describe_error(exc):
+    # ValueErrors are about the request, and say what's wrong. Anything else is a bug, so give the
+    # type too.
+    return str(exc) if isinstance(exc, ValueError) else f"{type(exc).__name__}: {exc}"
+
+
+async def connection_broken(reader):
+    # Only finishes if the connection breaks. A client that's done sending (even one that shuts
+    # down its side after the request) still gets the whole stream, until a write fails.
+    try:
+        while await reader.read(READ_SIZE):
+            pass
+    except ConnectionError:
+        return
+    await asyncio.get_running_loop().create_future()
+
+
+def next_record(records, disconnected):
+    # Runs on the analysis thread. A client might have left while this step was queued.
+    if disconnected.is_set():
+        return None
+    return next(records, None)
+
+
+class AnalysisServer:
+    # Serves analysis over HTTP, one JSON record per line. All the analysis happens on a single
+    # thread, so the caches are shared across every request, but never touched concurrently.
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    async def run_in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            for _ in range(MAX_HEADER_LINES):
+                if (await reader.readline()).strip() == b'':
+                    break
+
+            if len(request_line) != 3:
+                await self.respond(writer, 400, {'error': "Malformed request"})
+            elif request_line[0] != 'GET':
+                await self.respond(writer, 405, {'error': "Only GET is supported"})
+            else:
+                await self.dispatch(request_line[1], reader, writer)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, target, reader, writer):
+        url = urlsplit(target)
+        route = ROUTES.get(url.path)
+        if route is None:
+            await self.respond(writer, 404, {'error': f"Try one of: {', '.join(ROUTES)}"})
+            return
+
+        try:
+            records = await self.run_in_thread(route, parse_qs(url.query))
+        except Exception as exc:
+            status = 400 if isinstance(exc, ValueError) else 500
+            await self.respond(writer, status, {'error': describe_error(exc)})
+        else:
+            await self.respond(writer, 200)
+            await self.stream(records, reader, writer)
+
+    async def respond(self, writer, status, record=None):
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            "Content-Type: application/x-ndjson\r\n"
+            "Connection: close\r\n\r\n".encode('latin-1')
+        )
+        if record is not None:
+            writer.write(json.dumps(record).encode('utf-8') + b'\n')
+        await writer.drain()
+
+    async def stream(self, records, reader, writer):
+        disconnected = threading.Event()
+        hung_up = asyncio.ensure_future(connection_broken(reader))
+        try:
+            while True:
+                step = asyncio.ensure_future(
+                    self.run_in_thread(next_record, records, disconnected)
+                )
+                await asyncio.wait({step, hung_up}, return_when=asyncio.FIRST_COMPLETED)
+                if not step.done():
+                    # Can't interrupt the step that's running, but don't start another one
+                    break
+
+                try:
+                    record = step.result()
+                except Exception as exc:
+                    # too late for an error status, so report it in the stream
+                    record = {'error': describe_error(exc)}
+                if record is None:
+                    break
+                writer.write(json.dumps(record).encode('utf-8') + b'\n')
+                await writer.drain()
+                if 'error' in record:
+                    break
+        finally:
+            hung_up.cancel()
+            disconnected.set()
+            # queued behind any running step, so the generator isn't closed while it's executing
+            try:
+                self.executor.submit(records.close)
+            except RuntimeError:
+                # the server is shutting down, and the generator goes with it
+                pass
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+        print("Loading word lists and pattern tables...", flush=True)
+        await self.run_in_thread(warm_up)
+
+        if socket_path is None:
+            server = await asyncio.start_server(self.handle, host, port)
+            print(f"Listening on http://{host}:{port}", flush=True)
+        else:
+            server = await asyncio.start_unix_server(self.handle, socket_path)
+            print(f"Listening on unix socket {socket_path}", flush=True)
+
+        try:
+            await server.serve_forever()
+        finally:
+            server.close()
+
+    def close(self):
+        # Drop any queued analysis steps. A step that's already running can't be interrupted, but
+        # nothing new starts after it.
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_server(host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    analysis_server = AnalysisServer()
+    try:
+        asyncio.run(analysis_server.serve(host, port, socket_path))
+    except KeyboardInterrupt:
+        print("\nServer stopped by Ctrl-C")
+    finally:
+        analysis_server.close()
@@ -0,0 +1,195 @@
+import json
+import os
+
+import numpy as np
+
+from patterns import (
+    GuessScores,
+    compute_encoded_patterns,
+    encode_words,
+    pattern_dtype,
+    score_pattern_rows,
+    word_lists_fingerprint,
+)
+
+
+# Cap on the memory used at once, while computing or scoring a tile of the table
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+
+# Roughly how many bytes of numpy temporaries each (guess, answer) pair in a tile needs while its
+# patterns are computed: the green and not-green masks for every letter, plus a few more
+COMPUTE_BYTES_PER_LETTER = 2
+COMPUTE_BYTES_OVERHEAD = 8
+
+# Scoring needs a few float64 arrays with a bin per pattern, for every row in the tile
+SCORE_BYTES_PER_PATTERN = 4 * 8
+
+
+def read_word_file(path):
+    # One word per line. Blank lines and lines starting with # are skipped.
+    with open(path) as f:
+        words = [line.strip().lower() for line in f]
+    return [word for word in words if word and not word.startswith('#')]
+
+
+def check_words(words):
+    # Returns the length of the words, which all have to match
+    lengths = {len(word) for word in words}
+    if len(lengths) != 1:
+        raise ValueError(f"Words must all be the same length, got lengths {sorted(lengths)}")
+    if not all(word.isascii() and word.isalpha() and word.islower() for word in words):
+        raise ValueError("Words must be lowercase letters a-z")
+    return lengths.pop()
+
+
+class TiledPatternTable:
+    # The pattern of every guess against every answer, for any word lists and word length, kept in
+    # a memory-mapped file instead of RAM. Rows are computed and scored one tile at a time, where
+    # a tile is as many rows as fit in memory_limit, so the lists can be as big as the disk allows.
+    #
+    # A JSON header next to the table records which word lists it's for, and how many rows are
+    # done. So an interrupted build picks up where it stopped, and a table for different words
+    # gets rebuilt from scratch.
+
+    def __init__(self, path, guess_words, answer_words, memory_limit=DEFAULT_MEMORY_LIMIT):
+        self.path = path
+        self.header_path = path + '.json'
+        self.guess_words = list(guess_words)
+        self.answer_words = list(answer_words)
+        self.memory_limit = memory_limit
+
+        self.word_length = check_words(self.guess_words + self.answer_words)
+        self.num_patterns = 3 ** self.word_length
+        self.dtype = np.dtype(pattern_dtype(self.word_length))
+        self.shape = (len(self.guess_words), len(self.answer_words))
+        self.tile_rows = self.rows_per_tile()
+
+        header = self.read_header()
+        if header is None:
+            self.rows_done = 0
+            self.patterns = np.memmap(path, dtype=self.dtype, mode='w+', shape=self.shape)
+            self.write_header()
+        else:
+            self.rows_done = header['rows_done']
+            self.patterns = np.memmap(path, dtype=self.dtype, mode='r+', shape=self.shape)
+
+    def fingerprint(self):
+        return word_lists_fingerprint(self.guess_words, self.answer_words)
+
+    def rows_per_tile(self):
+        num_answers = max(1, self.shape[1])
+        bytes_per_row = max(
+            num_answers * (
+                self.word_length * COMPUTE_BYTES_PER_LETTER
+                + COMPUTE_BYTES_OVERHEAD
+                + self.dtype.itemsize
+            ),
+            num_answers * self.dtype.itemsize + self.num_patterns * SCORE_BYTES_PER_PATTERN,
+        )
+        return max(1, self.memory_limit // bytes_per_row)
+
+    def read_header(self):
+        # Returns None if there's no usable table on disk yet
+        if not (os.path.exists(self.path) and os.path.exists(self.header_path)):
+            return None
+        try:
+            with open(self.header_path) as f:
+                header = json.load(f)
+        except (ValueError, OSError):
+            # a corrupt or truncated header, so the table can't be trusted either
+            return None
+        if not isinstance(header, dict):
+            return None
+        expected = {
+            'fingerprint': self.fingerprint(),
+            'shape': list(self.shape),
+            'dtype': self.dtype.str,
+        }
+        if any(header.get(key) != value for key, value in expected.items()):
+            return None
+        rows_done = header.get('rows_done')
+        if not isinstance(rows_done, int) or not 0 <= rows_done <= self.shape[0]:
+            return None
+        if os.path.getsize(self.path) != self.shape[0] * self.shape[1] * self.dtype.itemsize:
+            return None
+        return header
+
+    def write_header(self):
+        header = {
+            'fingerprint': self.fingerprint(),
+            'shape': list(self.shape),
+            'dtype': self.dtype.str,
+            'rows_done': self.rows_done,
+        }
+        building_path = self.header_path + '.building'
+        with open(building_path, 'w') as f:
+            json.dump(header, f)
+        os.replace(building_path, self.header_path)
+
+    def tiles(self):
+        for start in range(0, self.shape[0], self.tile_rows):
+            yield start, min(start + self.tile_rows, self.shape[0])
+
+    def is_complete(self):
+        return self.rows_done >= self.shape[0]
+
+    def compute(self, progress=None):
+        # Fill in the rest of the table. progress, if given, gets called with (rows done, rows).
+        answer_letters = encode_words(self.answer_words, self.word_length)
+        for start, stop in self.tiles():
+            if stop <= self.rows_done:
+                continue
+            start = max(start, self.rows_done)
+            guess_letters = encode_words(self.guess_words[start:stop], self.word_length)
+            self.patterns[start:stop] = compute_encoded_patterns(guess_letters, answer_letters)
+            self.patterns.flush()
+
+            # only count the rows once they're safely on disk
+            self.rows_done = stop
+            self.write_header()
+            if progress is not None:
+                progress(self.rows_done, self.shape[0])
+
+    def score(self, answer_indices=None):
+        # Scores for every guess, against all answers or just some of them, streamed through
+        # one tile at a time
+        if not self.is_complete():
+            self.compute()
+
+        tile_scores = []
+        for start, stop in self.tiles():
+            rows = np.asarray(self.patterns[start:stop])
+            if answer_indices is not None:
+                rows = rows[:, answer_indices]
+            tile_scores.append(score_pattern_rows(rows, self.num_patterns))
+        if tile_scores:
+            return GuessScores(*(np.concatenate(field) for field in zip(*tile_scores)))
+        else:
+            return score_pattern_rows(np.zeros((0, self.shape[1]), dtype=self.dtype))
+
+    def best_guesses(self, count, answer_indices=None):
+        # The count guesses with the fewest expected remaining answers, as (score, guess) tuples
+        expected_remaining = self.score(answer_indices).expected_remaining
+        order = np.lexsort((np.arange(len(expected_remaining)), expected_remaining))[:count]
+        return [(expected_remaining[idx].item(), self.guess_words[idx]) for idx in order]
+
+
+def print_best_openers(
+    guess_path,
+    answer_path=None,
+    table_path='variant.patterns',
+    memory_limit=DEFAULT_MEMORY_LIMIT,
+    count=10,
+):
+    guess_words = read_word_file(guess_path)
+    answer_words = guess_words if answer_path is None else read_word_file(answer_path)
+    table = TiledPatternTable(table_path, guess_words, answer_words, memory_limit)
+    print(
+        f"{len(guess_words)} guesses x {len(answer_words)} answers, {table.word_length} letters,"
+        f" {table.tile_rows} rows per tile"
+    )
+    if not table.is_complete():
+        table.compute(lambda done, total: print(f"Computed {done}/{total} rows", flush=True))
+
+    for rank, (score, guess) in enumerate(table.best_guesses(count), start=1):
+        print(f"#{rank}: {guess!r}, leaving {score:.1f} words on average")
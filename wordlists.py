@@ -0,0 +1,132 @@
+import json
+import os
+
+import numpy as np
+
+
+# Importing words.py means parsing a huge literal and re-reading the text files, every time. So
+# the lists get compiled into INDEX_PATH: every word packed into fixed-width bytes, the answers in
+# their original order, and a membership bitset per list. That file gets read in one go on startup,
+# and rebuilt (by save_index()) whenever any of SOURCE_FILES change.
+
+WORD_LENGTH = 5
+SOURCE_FILES = ('words.py', 'unlikely_words.txt', 'as_likely_as_answers.txt')
+INDEX_PATH = 'words.idx'
+INDEX_MAGIC = b'wordle-index 1\n'
+
+# Lists stored as membership bitsets. answers is stored separately, because its order matters.
+MEMBERSHIP_LISTS = ('valid', 'likely', 'unlikely')
+
+
+def source_stamps():
+    stamps = {}
+    for path in SOURCE_FILES:
+        stat = os.stat(path)
+        stamps[path] = [stat.st_mtime_ns, stat.st_size]
+    return stamps
+
+
+def build_index(path=INDEX_PATH):
+    import words
+
+    lists = {name: getattr(words, name) for name in MEMBERSHIP_LISTS}
+    all_words = sorted(set().union(words.answers, *lists.values()))
+    positions = {word: idx for idx, word in enumerate(all_words)}
+
+    sections = [
+        ('words', ''.join(all_words).encode('ascii')),
+        ('answers', np.array([positions[word] for word in words.answers], dtype='<u4').tobytes()),
+    ]
+    for name, word_list in lists.items():
+        mask = np.zeros(len(all_words), dtype=bool)
+        mask[[positions[word] for word in word_list]] = True
+        sections.append((name, np.packbits(mask).tobytes()))
+
+    header = {
+        'sources': source_stamps(),
+        'word_length': WORD_LENGTH,
+        'num_words': len(all_words),
+        'num_answers': len(words.answers),
+        'sections': {},
+    }
+    offset = 0
+    for name, data in sections:
+        header['sections'][name] = [offset, len(data)]
+        offset += len(data)
+
+    encoded_header = json.dumps(header).encode('ascii') + b'\n'
+    building_path = path + '.building'
+    with open(building_path, 'wb') as f:
+        f.write(INDEX_MAGIC)
+        f.write(encoded_header)
+        for _, data in sections:
+            f.write(data)
+    os.replace(building_path, path)
+
+
+def read_index(path=INDEX_PATH):
+    # Returns None if the index is missing, out of date, or unreadable (like a half-written or
+    # truncated file), so it gets rebuilt
+    if not os.path.exists(path):
+        return None
+    try:
+        return parse_index(path)
+    except (ValueError, KeyError, TypeError, IndexError):
+        return None
+
+
+def parse_index(path):
+    with open(path, 'rb') as f:
+        if f.readline() != INDEX_MAGIC:
+            return None
+        header = json.loads(f.readline())
+        if header['sources'] != source_stamps() or header['word_length'] != WORD_LENGTH:
+            return None
+        # every list gets decoded into python objects right away, so mapping the file buys nothing
+        data = f.read()
+
+    def section(name, dtype):
+        offset, length = header['sections'][name]
+        count = length // np.dtype(dtype).itemsize
+        return np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+
+    packed_words = section('words', np.uint8).tobytes().decode('ascii')
+    all_words = [
+        packed_words[start:start + WORD_LENGTH]
+        for start in range(0, len(packed_words), WORD_LENGTH)
+    ]
+
+    lists = {'answers': [all_words[idx] for idx in section('answers', '<u4').tolist()]}
+    for name in MEMBERSHIP_LISTS:
+        mask = np.unpackbits(section(name, np.uint8), count=header['num_words']).view(bool)
+        lists[name] = {all_words[idx] for idx in np.flatnonzero(mask).tolist()}
+    return lists
+
+
+def lists_from_words():
+    # The slow way, straight from words.py and the text files
+    import words
+    return {name: getattr(words, name) for name in ('answers', *MEMBERSHIP_LISTS)}
+
+
+def save_index(path=INDEX_PATH):
+    # (Re)build the index, so the next run starts faster. Returns whether it worked. Failing to
+    # save it (like in a read-only checkout) only means the next run is slow too.
+    try:
+        build_index(path)
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+    return read_index(path) is not None
+
+
+# Importing this module only ever reads the index. The command line calls save_index() when
+# LOADED_FROM_INDEX is False, so that a missing or stale index gets written by the program that
+# owns it, not by anything that happens to import the word lists.
+_lists = read_index()
+LOADED_FROM_INDEX = _lists is not None
+if _lists is None:
+    _lists = lists_from_words()
+answers = _lists['answers']
+valid = _lists['valid']
+likely = _lists['likely']
+unlikely = _lists['unlikely']